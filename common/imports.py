@@ -4,25 +4,44 @@ import os
 proj_dir = os.path.abspath(
         os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-from icecream import ic
-ic.configureOutput(includeContext=True)
-
-
 import logging
-logging.basicConfig(level=logging.DEBUG, encoding='utf-8')
 
-# Create a file handler for critical messages
+# Importing this module has no side effects: logging is configured by
+# configure_logging(), called from the __main__ blocks of the scripts, and
+# icecream (~130 ms to import) is only loaded on the first `ic` lookup.
 log_dir = os.path.join(proj_dir, 'general_issues.log')
-file_handler = logging.FileHandler(log_dir)
-file_handler.setLevel(logging.CRITICAL)
 
-# Add a formatter to the file handler
-formatter = logging.Formatter('%(levelname)s: %(filename)s - %(funcName)s - line %(lineno)d\n\t%(message)s')
-file_handler.setFormatter(formatter)
 
-# Remove the existing handlers from the root logger
-logging.getLogger().handlers = []
+def configure_logging() -> None:
+    """
+    Routes critical messages of the root logger to general_issues.log and
+    drops everything else, as scripts of this project expect. Libraries and
+    workers that never call it leave logging configuration to their host.
+    """
+    logging.basicConfig(level=logging.DEBUG, encoding='utf-8')
+
+    # Create a file handler for critical messages
+    file_handler = logging.FileHandler(log_dir)
+    file_handler.setLevel(logging.CRITICAL)
+
+    # Add a formatter to the file handler
+    formatter = logging.Formatter(
+        '%(levelname)s: %(filename)s - %(funcName)s - line %(lineno)d'
+        '\n\t%(message)s')
+    file_handler.setFormatter(formatter)
+
+    # Remove the existing handlers from the root logger
+    logging.getLogger().handlers = []
+
+    # Add the file handler to the root logger
+    logging.getLogger().addHandler(file_handler)
 
-# Add the file handler to the root logger
-logging.getLogger().addHandler(file_handler)
 
+def __getattr__(name: str):
+    # `from common.imports import ic` imports and configures icecream
+    if name == 'ic':
+        from icecream import ic
+        ic.configureOutput(includeContext=True)
+        globals()['ic'] = ic
+        return ic
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
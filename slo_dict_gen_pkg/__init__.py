@@ -1,12 +1,45 @@
-from .parsers import XMLtoSloleksEntrys
-from .sloleks_objs import SloleksEntry, WordForm, Representation
-from .parsers import SskjEntry
-from utils import grammar_utils
 from common.imports import *
+import importlib
 import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Modules log through logging.getLogger(__name__); without a handler here a
+# host that never configures logging would get the last-resort stderr one
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Public name -> module defining it. Imported on first access (PEP 562), so
+# a worker that only needs e.g. form_index does not pay for the parsers'
+# and formatting's dependencies.
+_lazy_imports: Dict[str, str] = {
+    'XMLtoSloleksEntrys': 'slo_dict_gen_pkg.parsers',
+    'SskjEntry': 'slo_dict_gen_pkg.parsers',
+    'SloleksEntry': 'slo_dict_gen_pkg.sloleks_objs',
+    'WordForm': 'slo_dict_gen_pkg.sloleks_objs',
+    'Representation': 'slo_dict_gen_pkg.sloleks_objs',
+}
+_lazy_modules: Dict[str, str] = {
+    'formatting': 'slo_dict_gen_pkg.formatting',
+    'grammar_utils': 'utils.grammar_utils',
+}
+
+
+def __getattr__(name: str):
+    if name in _lazy_imports:
+        value = getattr(importlib.import_module(_lazy_imports[name]), name)
+    elif name in _lazy_modules:
+        value = importlib.import_module(_lazy_modules[name])
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_lazy_imports, *_lazy_modules])
+
+
 __all__ = ["formatting", 'XMLtoSloleksEntrys', 'grammar_utils', 'os', "List",
-           "Dict", "logging", "SloleksEntry", "WordForm", "Representation", "SskjEntry"]
\ No newline at end of file
+           "Dict", "logging", "SloleksEntry", "WordForm", "Representation",
+           "SskjEntry"]
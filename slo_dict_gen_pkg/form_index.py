@@ -0,0 +1,150 @@
+from common.imports import *
+
+import mmap
+import json
+import struct
+import zlib
+
+# File layout (all integers little-endian):
+#   header   : magic, version, bucket count, record count
+#   buckets  : bucket count + 1 u32 offsets into the record area; records of
+#              bucket b lie in [buckets[b], buckets[b + 1])
+#   records  : u16 key length, key, u32 value length, value (UTF-8 JSON)
+# A lookup hashes the form with crc32, reads two bucket offsets and compares
+# the (usually single) key in that bucket, so only the touched pages of the
+# mmap'd file are ever read from disk.
+MAGIC: bytes = b'SLFI'
+VERSION: int = 1
+HEADER = struct.Struct('<4sIII')
+OFFSET = struct.Struct('<I')
+KEY_LEN = struct.Struct('<H')
+VALUE_LEN = struct.Struct('<I')
+
+FormAnalysis = Tuple[str, str, Tuple[str, ...]]
+
+
+def _bucket(key: bytes, bucket_count: int) -> int:
+    return zlib.crc32(key) % bucket_count
+
+
+def write_form_index(
+        data: Dict[str, List[FormAnalysis]],
+        filepath: str
+) -> None:
+    """
+    Writes a form -> [(lemma, part_of_speech, grammar_names), ...] mapping
+    as an on-disk hash table readable by FormIndex.
+
+    :param data: Mapping of form_representation to its analyses.
+    :param filepath: Destination file path.
+    """
+    bucket_count = max(len(data), 1)
+    buckets: List[List[bytes]] = [[] for _ in range(bucket_count)]
+    for form, analyses in data.items():
+        key = form.encode('utf-8')
+        value = json.dumps(analyses, ensure_ascii=False,
+                           separators=(',', ':')).encode('utf-8')
+        buckets[_bucket(key, bucket_count)].append(
+            KEY_LEN.pack(len(key)) + key + VALUE_LEN.pack(len(value)) + value)
+
+    records_start = HEADER.size + OFFSET.size * (bucket_count + 1)
+    offsets = [records_start]
+    for records in buckets:
+        offsets.append(offsets[-1] + sum(len(record) for record in records))
+
+    with open(filepath, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, bucket_count, len(data)))
+        f.write(b''.join(OFFSET.pack(offset) for offset in offsets))
+        for records in buckets:
+            f.write(b''.join(records))
+
+
+class FormIndex:
+    """
+    Read-only, memory-mapped reverse index from an inflected form to the
+    lemmas it belongs to. Nothing is read on instantiation; the file is
+    mapped on the first lookup and only the pages a lookup touches are paged
+    in, so a cold process answers in milliseconds whatever the file size.
+
+    Public Methods:
+        get(form): List of (lemma, part_of_speech, grammar_names) tuples.
+        close(): Unmaps the file.
+    """
+
+    def __init__(self, filepath: str):
+        """
+        :param filepath: Path to a file written by write_form_index.
+        """
+        self.filepath: str = filepath
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._bucket_count: int = 0
+        self._record_count: int = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        self._open()
+        return self._record_count
+
+    def __contains__(self, form: str) -> bool:
+        return bool(self.get(form))
+
+    def __getitem__(self, form: str) -> List[FormAnalysis]:
+        analyses = self.get(form)
+        if not analyses:
+            raise KeyError(form)
+        return analyses
+
+    def _open(self) -> None:
+        if self._mmap is not None:
+            return
+        self._file = open(self.filepath, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        magic, version, self._bucket_count, self._record_count = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{self.filepath} is not a version {VERSION} '
+                             f'form index')
+
+    def get(self, form: str) -> List[FormAnalysis]:
+        """
+        :param form: Inflected form as typed, e.g. "hiše".
+        :return: (lemma, part_of_speech, grammar_names) for every entry the
+            form belongs to; empty list if the form is unknown.
+        """
+        self._open()
+        buf = self._mmap
+        key = form.encode('utf-8')
+        bucket_offset = HEADER.size + OFFSET.size * _bucket(
+            key, self._bucket_count)
+        position, = OFFSET.unpack_from(buf, bucket_offset)
+        end, = OFFSET.unpack_from(buf, bucket_offset + OFFSET.size)
+
+        while position < end:
+            key_len, = KEY_LEN.unpack_from(buf, position)
+            position += KEY_LEN.size
+            record_key = buf[position:position + key_len]
+            position += key_len
+            value_len, = VALUE_LEN.unpack_from(buf, position)
+            position += VALUE_LEN.size
+            if record_key == key:
+                return [(lemma, part_of_speech, tuple(grammar_names))
+                        for lemma, part_of_speech, grammar_names
+                        in json.loads(buf[position:position + value_len])]
+            position += value_len
+        return []
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,22 +1,52 @@
 from common.imports import *
 from slo_dict_gen_pkg.sloleks_objs import Representation
 from slo_dict_gen_pkg import SloleksEntry
-from utils.parsing_utils import sample_entry_obj
 from utils.grammar_utils import ordered_grammar_name, return_gram_feat_type, gfcat, table_types
-
-from airium import Airium
-import pyperclip
+from slo_dict_gen_pkg import sloleks_objs
+from utils import grammar_utils
+
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations
+from typing import FrozenSet, TYPE_CHECKING
+import hashlib
+
+# airium (which imports bs4) is imported by the functions rendering through it, so lookups and the template backend skip it
+if TYPE_CHECKING:
+    from airium import Airium
 import os
 import sys
 
 # Add the parent directory
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+logger = logging.getLogger(__name__)
+
 failure: bool = False
 
 
+@lru_cache(maxsize=None)
+def renderer_version() -> str:
+    """
+    Hash of the source that determines rendered inflection sections (this module, the grammar tables, and grammar
+    name derivation). Any edit to those files changes it, marking stored sections as stale.
+
+    :return: hex digest
+    """
+    digest = hashlib.sha1()
+    for path in (__file__, grammar_utils.__file__, sloleks_objs.__file__):
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
 class Definition:
-    def __init__(self, entry: SloleksEntry, test: bool = False):
+    def __init__(self, entry: SloleksEntry, test: bool = False, asset_url: str = None):
+        """
+        :param entry: (SloleksEntry)
+        :param asset_url: (str) if given, CSS/JS are referenced from this URL (see HTMLib.write_assets) instead of being
+            inlined into every page
+        """
         self.entry = entry
         self.button_sections = [InflectionSection(entry)]
 
@@ -24,7 +54,7 @@ class Definition:
         for section in self.button_sections:
             button_stuff += HTMLib.air_button(str(section), entry=self.entry)
 
-        self.formatted = HTMLib.airhead_embody(button_stuff, entry=self.entry)
+        self.formatted = HTMLib.airhead_embody(button_stuff, entry=self.entry, asset_url=asset_url)
 
     def __str__(self):
         return str(self.formatted)
@@ -45,7 +75,7 @@ class InflectionSection:
         wordforms_displayed = int(tables)
 
         if wordforms_displayed != len(entry.all_reps):
-            logging.critical(f"{wordforms_displayed}/{len(entry.all_reps)} forms displayed for {entry.lemma}")
+            logger.critical(f"{wordforms_displayed}/{len(entry.all_reps)} forms displayed for {entry.lemma}")
             warning = ((f'Warning: <span class=red-underline>'
                         f'{wordforms_displayed}</span>/{len(entry.all_reps)} '
                         f'wordforms displayed. All valid forms listed at bottom of page.<br>')
@@ -64,18 +94,21 @@ class InflectionSection:
 
 
 class Tables:
+    # part of speech -> label matrices of its table types, see table_layouts()
+    _layouts: Dict[str, List[List[List]]] = {}
+
     def __init__(self, entry: SloleksEntry):
         self.tables: str = ''
         self.representations_displayed: int = 0
+        self._prefix_entry: Optional[SloleksEntry] = None
+        self._shared_prefix: str = ''
 
-        part_of_speech: str = entry.part_of_speech
-        table_type_index: List[Tuple[str, List[List[str]]]] = list(table_types[part_of_speech].items())
-
-        for table_type in table_type_index:
-            table_type_matrix: List[List] = self.make_table_type_matrix(table_type)
+        reps_index: Dict[FrozenSet[str], List[Representation]] = self.index_representations(entry)
+        for table_type_matrix in self.table_layouts(entry.part_of_speech):
             reps_matrix: List[List[List[Representation]]] = self.make_representations_matrix(
                 entry,
-                table_type_matrix
+                table_type_matrix,
+                reps_index
             )
             raw_table, representations_added = self.table_from_matrix(entry, reps_matrix)
             if representations_added > 0:
@@ -88,6 +121,21 @@ class Tables:
     def __int__(self):
         return int(self.representations_displayed)
 
+    @classmethod
+    def table_layouts(cls, part_of_speech: str) -> List[List[List]]:
+        """
+        Label matrices for every table type of a part of speech. They depend only on the static table_types, so each
+        is built once per process on first use and shared by all entries. Shared, so must never be mutated.
+
+        :param part_of_speech: (str) entry part of speech
+        :return: one make_table_type_matrix() result per table type
+        """
+        if part_of_speech not in cls._layouts:
+            cls._layouts[part_of_speech] = [
+                cls.make_table_type_matrix(table_type) for table_type in table_types[part_of_speech].items()
+            ]
+        return cls._layouts[part_of_speech]
+
     @staticmethod
     def make_table_type_matrix(table_type: tuple[str, list[list[str]]]) -> List[List]:
         table_name: str = table_type[0]
@@ -101,10 +149,10 @@ class Tables:
             table_type_matrix[i + 1][0] = label
 
         # Fill in the cell values based on row and column labels
+        col_features: List[Optional[str]] = [return_gram_feat_type(col) for col in table_col_labels]
         for i, row in enumerate(table_row_labels):
-            for j, col in enumerate(table_col_labels):
-                row_feature = return_gram_feat_type(row)
-                col_feature = return_gram_feat_type(col)
+            row_feature = return_gram_feat_type(row)
+            for j, (col, col_feature) in enumerate(zip(table_col_labels, col_features)):
 
                 # Handle exceptions for when the table type name is needed
                 v_form: str = table_type[0] if table_type[0] in gfcat['vform'] else row if row in {"infinitive", "supine"} else None
@@ -115,7 +163,7 @@ class Tables:
                 degree: str = row if row_feature == "degree" else None
                 clitic: str = row if row_feature == "clitic" else None
 
-                grammar_names: List(str) = ordered_grammar_name(
+                grammar_names: Tuple[str] = ordered_grammar_name(
                     v_form=v_form,
                     case=case,
                     person=person,
@@ -123,24 +171,43 @@ class Tables:
                     gender=gender,
                     degree=degree,
                     clitic=clitic,
-                    return_type="list"
+                    return_type="tuple"
                 )
 
-                table_type_matrix[i + 1][j + 1] = [grammar_names]
+                table_type_matrix[i + 1][j + 1] = grammar_names
         return table_type_matrix
 
     @staticmethod
-    def make_representations_matrix(entry: SloleksEntry, table_type_matrix: List[List]):
+    def index_representations(entry: SloleksEntry) -> Dict[FrozenSet[str], List[Representation]]:
+        """
+        Maps every subset of each representation's grammar names to the representations that have it, in reps_dict
+        order. A table cell matches all representations whose grammar names include the cell's, so with this index each
+        cell resolves with a single dict lookup instead of a scan over reps_dict. Grammar names hold at most a handful
+        of features, so the subsets stay few.
+
+        :param entry: (SloleksEntry)
+        :return: grammar name subset -> matching representations
+        """
+        reps_index: Dict[FrozenSet[str], List[Representation]] = defaultdict(list)
+        for rep_grammar_names, reps in entry.reps_dict.items():
+            features = set(rep_grammar_names)
+            for size in range(len(features) + 1):
+                for subset in combinations(features, size):
+                    reps_index[frozenset(subset)].extend(reps)
+        return reps_index
+
+    @staticmethod
+    def make_representations_matrix(entry: SloleksEntry, table_type_matrix: List[List],
+                                    reps_index: Dict[FrozenSet[str], List[Representation]] = None):
+        if reps_index is None:
+            reps_index = Tables.index_representations(entry)
         table_name = table_type_matrix[0][0]
         row_labels = [row[0] for row in table_type_matrix]
         col_labels = table_type_matrix[0][1:]
-        matrix_core = [row[1:] for row in table_type_matrix[1:]]
 
-        for cell in [cell for row in matrix_core for cell in row]:
-            cell_grammar_names = cell.pop(0)
-            for rep_grammar_names in entry.reps_dict:
-                if all(grammar_feature in rep_grammar_names for grammar_feature in cell_grammar_names):
-                    cell.extend(entry.reps_dict.get(rep_grammar_names, []))
+        # Layout cells hold the grammar names a representation needs; fresh cells keep the shared layout untouched
+        matrix_core = [[list(reps_index.get(frozenset(cell_grammar_names), [])) for cell_grammar_names in row[1:]]
+                       for row in table_type_matrix[1:]]
 
         row_labels[0] = table_name
         matrix_restored = [col_labels] + matrix_core
@@ -158,10 +225,13 @@ class Tables:
         return matrix_restored
 
     def table_from_matrix(self, entry: SloleksEntry, representation_matrix: List):
+        if HTMLib.backend == "template":
+            return self.table_from_matrix_template(entry, representation_matrix)
         row_labels = [row[0] for row in representation_matrix[1:]]
         col_labels = representation_matrix[0][1:]
         matrix_core = [row[1:] for row in representation_matrix[1:]]
         added = 0
+        from airium import Airium
         table = Airium()
         with table.p(klass="lineabove"):
             with table.b():
@@ -193,6 +263,48 @@ class Tables:
                                             table(representation.pronunciation_dict.get("IPA", None))
         return str(table), added
 
+    def table_from_matrix_template(self, entry: SloleksEntry, representation_matrix: List):
+        """
+        Same markup as the Airium path of table_from_matrix (indentation included), built by joining lines
+        """
+        row_labels = [row[0] for row in representation_matrix[1:]]
+        col_labels = representation_matrix[0][1:]
+        matrix_core = [row[1:] for row in representation_matrix[1:]]
+        added = 0
+        header: str = representation_matrix[0][0]
+        lines: List[str] = [
+            '<p class="lineabove">',
+            '  <b>',
+            f'    {header.title() if header != "agender" else "General"}',
+            '  </b>',
+            '  <table class="inflection">'
+        ]
+        # Prevent header in table for non-inflected words
+        if col_labels and col_labels[0] != 'form':
+            lines.append('    <tr>')
+            lines.append('      <th></th>')
+            lines.extend(f'      <th>{col_label}</th>' for col_label in col_labels)
+            lines.append('    </tr>')
+        for row_label, row in zip(row_labels, matrix_core):
+            lines.append('    <tr>')
+            if row_label != 'form':
+                lines.append(f'      <th>{row_label}</th>')
+            for cell in row:
+                lines.append('      <td>')
+                for representation in cell:
+                    representation_formatted = self.format_forms_for_table(entry, representation)
+                    if representation_formatted != '':
+                        added += 1
+                    lines.append(HTMLib.POP_UP_TEMPLATE.format(
+                        formatted=representation_formatted,
+                        ipa=representation.pronunciation_dict.get("IPA", None)
+                    ))
+                lines.append('      </td>')
+            lines.append('    </tr>')
+        lines.append('  </table>')
+        lines.append('</p>')
+        return '\n'.join(lines), added
+
     def format_forms_for_table(self, entry: SloleksEntry, to_format_rep_obj: Representation):
         """
         Takes given word forms by reference to a shared grammar name
@@ -202,15 +314,9 @@ class Tables:
         :return:
         """
 
-        # Removing negative forms from consideration because they do not share a prefix with the
-        # other wordForms. Otherwise, this breaks the bolded inflection suffixes for the entire entry
-        non_negative_forms = []
-        for rep in entry.all_reps:
-            non_negative_forms = non_negative_forms + [rep.form_representation] if "negative" not in rep.norms else non_negative_forms
-
-        shared_prefix = self.common_prefix(non_negative_forms)
+        shared_prefix = self.shared_prefix(entry)
         bolded = self.bold_except(to_format_rep_obj.form_representation, shared_prefix)
-        grayed = self.gray_unused(to_format_rep_obj.frequency, bolded)
+        grayed = self.gray_unused(to_format_rep_obj.frequency, bolded, to_format_rep_obj.rare)
 
         formatted = grayed
         if to_format_rep_obj.norms:
@@ -228,6 +334,21 @@ class Tables:
 
         return formatted
 
+    def shared_prefix(self, entry: SloleksEntry) -> str:
+        """
+        Prefix shared by all of an entry's forms, computed once per entry and reused for every cell of every table
+
+        :param entry: (SloleksEntry)
+        :return: shared prefix
+        """
+        if self._prefix_entry is not entry:
+            # Removing negative forms from consideration because they do not share a prefix with the
+            # other wordForms. Otherwise, this breaks the bolded inflection suffixes for the entire entry
+            non_negative_forms = [rep.form_representation for rep in entry.all_reps if "negative" not in rep.norms]
+            self._shared_prefix = self.common_prefix(non_negative_forms)
+            self._prefix_entry = entry
+        return self._shared_prefix
+
     @staticmethod
     def common_prefix(strings) -> str:
         if not strings:
@@ -247,16 +368,50 @@ class Tables:
             return word
 
     @staticmethod
-    def gray_unused(frequency: int, to_gray: str) -> str:
-        if frequency == 0:
+    def gray_unused(frequency: int, to_gray: str, rare: Optional[bool] = None) -> str:
+        # rare is the flag precomputed over the whole lexicon; without it fall back to unattested forms only
+        if (frequency == 0) if rare is None else rare:
             return f"<span class=gray>{to_gray}</span>"
         else:
             return to_gray
 
 
 class HTMLib:
+    # "airium" builds markup through Airium; "template" joins precompiled strings into byte-identical markup, faster
+    backend: str = "airium"
+
+    # asset path -> (mtime_ns, contents); see HTMLib.asset()
+    _asset_cache: Dict[str, Tuple[int, str]] = {}
+
+    # One representation of a table cell, indented as Airium nests it inside <td>
+    POP_UP_TEMPLATE: str = '\n'.join([
+        '        <span class="pop-up">',
+        '          {formatted}',
+        '          <span class="pop-up-content">',
+        '            Pronunciation:',
+        '            <br />',
+        '            {ipa}',
+        '          </span>',
+        '        </span>'
+    ])
+
+    @staticmethod
+    def attr(value: str) -> str:
+        """
+        Attribute value as Airium writes it
+        """
+        value = {"True": "true", "False": "false", "None": "null"}.get(value, value)
+        return value.replace('"', '&quot;')
+
     @staticmethod
-    def airhead_embody(*html: Union[Airium, str], entry: SloleksEntry) -> str:
+    def airhead_embody(*html: Union['Airium', str], entry: SloleksEntry, asset_url: str = None) -> str:
+        """
+        :param asset_url: (str) base URL of the shared modern.css/table_scripts.js; when given they are linked instead
+            of inlined
+        """
+        if HTMLib.backend == "template":
+            return HTMLib.airhead_embody_template(*html, entry=entry, asset_url=asset_url)
+        from airium import Airium
         a: Airium = Airium()
 
         a('<!DOCTYPE html>')
@@ -266,29 +421,80 @@ class HTMLib:
                 a.meta(name="viewport", content="width=device-width, initial-scale=1.0")
                 a.meta(charset="utf-8")
                 a.title(_t=entry.lemma)
-                with a.style():
-                    a(HTMLib.css("modern"))
+                if asset_url is None:
+                    with a.style():
+                        a(HTMLib.css("modern"))
+                else:
+                    a.link(rel="stylesheet", href=f'{asset_url}/modern.css')
             with a.body():
                 for item in html:
                     a(str(item))
-                with a.script():
-                    a(HTMLib.js())
+                if asset_url is None:
+                    with a.script():
+                        a(HTMLib.js())
+                else:
+                    a.script(src=f'{asset_url}/table_scripts.js')
         return str(a)
 
     @staticmethod
-    def air_button(*html: Union[Airium, str], entry: SloleksEntry, id: str = "inflection") -> str:
+    def airhead_embody_template(*html: Union['Airium', str], entry: SloleksEntry, asset_url: str = None) -> str:
+        lines: List[str] = [
+            '<!DOCTYPE html>',
+            '<html lang="en">',
+            '  <head>',
+            '    <meta charset="utf-8" />',
+            '    <meta name="viewport" content="width=device-width, initial-scale=1.0" />',
+            '    <meta charset="utf-8" />',
+            f'    <title>{entry.lemma}</title>'
+        ]
+        if asset_url is None:
+            lines.extend(['    <style>', f'      {HTMLib.css("modern")}', '    </style>'])
+        else:
+            lines.append(f'    <link rel="stylesheet" href="{HTMLib.attr(f"{asset_url}/modern.css")}" />')
+        lines.append('  </head>')
+        lines.append('  <body>')
+        lines.extend(f'    {item}' for item in html)
+        if asset_url is None:
+            lines.extend(['    <script>', f'      {HTMLib.js()}', '    </script>'])
+        else:
+            lines.append(f'    <script src="{HTMLib.attr(f"{asset_url}/table_scripts.js")}"></script>')
+        lines.append('  </body>')
+        lines.append('</html>')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def air_button(*html: Union['Airium', str], entry: SloleksEntry, id: str = "inflection") -> str:
+        if HTMLib.backend == "template":
+            return HTMLib.air_button_template(*html, entry=entry, id=id)
+        from airium import Airium
         a: Airium = Airium()
 
         with a.div(klass='container'):
             a.button(klass='button', onclick=f"toggleTable('inflection_{entry.lemma}')", _t=f'{id}s')
             with a.div(klass='content', id=f'{id}_{entry.lemma}'):
-                logging.warning("after debugging, must reset klass to 'content hidden'")
+                logger.debug("after debugging, must reset klass to 'content hidden'")
                 for input in html:
                     a(str(input))
         return str(a)
 
     @staticmethod
-    def air_section_info(*html: Union[Airium, str], entry: SloleksEntry) -> str:
+    def air_button_template(*html: Union['Airium', str], entry: SloleksEntry, id: str = "inflection") -> str:
+        logger.debug("after debugging, must reset klass to 'content hidden'")
+        onclick = HTMLib.attr(f"toggleTable('inflection_{entry.lemma}')")
+        content_id = HTMLib.attr(f'{id}_{entry.lemma}')
+        lines: List[str] = [
+            '<div class="container">',
+            f'  <button class="button" onclick="{onclick}">{id}s</button>',
+            f'  <div class="content" id="{content_id}">'
+        ]
+        lines.extend(f'    {input}' for input in html)
+        lines.append('  </div>')
+        lines.append('</div>')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def air_section_info(*html: Union['Airium', str], entry: SloleksEntry) -> str:
+        from airium import Airium
         a = Airium(base_indent="")
         with a.p(klass='heading'):
             a(f'<b>{entry.part_of_speech}-{len(entry.forms_dict)}</b>; ')
@@ -309,9 +515,7 @@ class HTMLib:
         :param aesthetic:
         :return: CSS text
         """
-        path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'CSS', f'{aesthetic}.css'))
-        with open(path, "r") as file:
-            return file.read()
+        return HTMLib.asset(HTMLib.css_path(aesthetic))
 
     @staticmethod
     def js(filename: str = "table_scripts") -> str:
@@ -320,9 +524,43 @@ class HTMLib:
 
         :return: JS text
         """
-        path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'js', f'{filename}.js'))
-        with open(path, "r") as file:
-            return file.read()
+        return HTMLib.asset(HTMLib.js_path(filename))
+
+    @staticmethod
+    def css_path(aesthetic: str = "modern") -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'css', f'{aesthetic}.css'))
+
+    @staticmethod
+    def js_path(filename: str = "table_scripts") -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'js', f'{filename}.js'))
+
+    @staticmethod
+    def asset(path: str) -> str:
+        """
+        Reads an asset file once per process and serves it from memory afterwards; re-read if its mtime changes
+
+        :param path: asset file path
+        :return: file contents
+        """
+        mtime = os.stat(path).st_mtime_ns
+        cached = HTMLib._asset_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, "r") as file:
+                cached = (mtime, file.read())
+            HTMLib._asset_cache[path] = cached
+        return cached[1]
+
+    @staticmethod
+    def write_assets(directory: str) -> None:
+        """
+        Writes the shared CSS and JS into directory, for pages rendered with asset_url pointing at it
+
+        :param directory: destination directory
+        """
+        os.makedirs(directory, exist_ok=True)
+        for path in (HTMLib.css_path("modern"), HTMLib.js_path("table_scripts")):
+            with open(os.path.join(directory, os.path.basename(path)), "w") as file:
+                file.write(HTMLib.asset(path))
 
     @staticmethod
     def footer():
@@ -338,6 +576,11 @@ class HTMLib:
 
 
 if __name__ == "__main__":
+    # Only needed here: parsing_utils pulls in icecream and tqdm, pyperclip the clipboard backends
+    from utils.parsing_utils import sample_entry_obj
+    import pyperclip
+
+    configure_logging()
     pos = ("pronoun")
 
     # Issues: se (pron)
@@ -1,22 +1,33 @@
 from common.imports import *
 from slo_dict_gen_pkg.sloleks_objs import SloleksEntry, WordForm, \
-    Representation
+    Representation, features_view
+from slo_dict_gen_pkg.form_index import FormAnalysis, write_form_index
 from utils.grammar_utils import ordered_grammar_name, de_critic, \
     ALPHA
 
 from dataclasses import dataclass
 from collections import defaultdict
-from tqdm import tqdm
+from typing import Iterator, Mapping, TYPE_CHECKING
 
 import xml.etree.ElementTree as Et
-from bs4 import BeautifulSoup
 
+from sys import intern
 import sqlite3
+import hashlib
+import mmap
+import io
 import pickle
 import json
 import os
 import re
 
+# bs4, tqdm and multiprocessing are imported where used, so loading Sloleks
+# entries does not pay for the SSKJ parser's or the batch jobs' dependencies
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
 
 # SLOLEKS
 
@@ -26,30 +37,44 @@ class XMLtoSloleksEntrys:
     objects.
 
     Public Methods:
-        none.
+        iter_entries(): Lazily yields SloleksEntry objects from the XML file.
 
     Instance Variables:
         xml_file (str): Path to the XML file.
+        stream (bool): Whether entries are yielded lazily on iteration
+        instead of being parsed up front.
         entries (List[SloleksEntry]): List of SloleksEntry objects parsed from
-        the XML file.
+        the XML file. None in streaming mode.
     """
+    # Feature items -> the one read-only view shared by every WordForm with
+    # them; read-only so a caller cannot change the features of other forms
+    _shared_features: Dict[Tuple[Tuple[str, str], ...],
+                           Mapping[str, str]] = {}
 
-    def __init__(self, xml_file: str):
+    def __init__(self, xml_file: str, stream: bool = False):
         """
         Initializes an XMLParser instance.
 
         :param xml_file: Path to the XML file to parse.
+        :param stream: If True, nothing is parsed on instantiation and
+            iterating the instance yields entries one <entry> at a time.
         """
         self.xml_file: str = xml_file
-        self.entries: List[SloleksEntry] = self._parse_xml_file()
+        self.stream: bool = stream
+        self.entries: Optional[List[SloleksEntry]] = (
+            None if stream else self._parse_xml_file())
 
     def __str__(self):
         return self.entries
 
     def __iter__(self):
+        if self.stream:
+            return self.iter_entries()
         return iter(self.entries)
 
     def __len__(self):
+        if self.stream:
+            raise TypeError("streaming XMLtoSloleksEntrys has no len()")
         return len(self.entries)
 
     def _parse_xml_file(self) -> List[SloleksEntry]:
@@ -59,12 +84,22 @@ class XMLtoSloleksEntrys:
 
         :return: List of SloleksEntry class objects.
         """
-        tree = Et.parse(self.xml_file)
-        root = tree.getroot()
-        entry_list = [self._parse_entry(entry_element) for entry_element
-                      in root.findall('.//entry')]
+        return list(self.iter_entries())
 
-        return entry_list
+    def iter_entries(self) -> Iterator[SloleksEntry]:
+        """
+        Parses xml file incrementally with iterparse, yielding a SloleksEntry
+        as soon as each <entry> element is closed. Finished elements are
+        cleared from the root so memory stays flat regardless of file size.
+
+        :return: Generator of SloleksEntry class objects.
+        """
+        context = Et.iterparse(self.xml_file, events=('start', 'end'))
+        _, root = next(context)
+        for event, element in context:
+            if event == 'end' and element.tag == 'entry':
+                yield self._parse_entry(element)
+                root.clear()
 
     def _parse_entry(self, entry_element: Et.Element) -> SloleksEntry:
         """
@@ -74,7 +109,7 @@ class XMLtoSloleksEntrys:
         :return: SloleksEntry object representing the parsed entry.
         """
         lemma = entry_element.find('.//lemma').text
-        part_of_speech = entry_element.find('.//category').text.lower()
+        part_of_speech = intern(entry_element.find('.//category').text.lower())
         lemma_grammatical_features = self._parse_grammatical_features(
             entry_element)
 
@@ -117,10 +152,14 @@ class XMLtoSloleksEntrys:
         :return: WordForm object representing the parsed wordForm element.
         """
 
-        msd = wordform_element.find('.//msd').text
+        msd = intern(wordform_element.find('.//msd').text)
 
         gram_features: Dict[str, str] = self._parse_grammatical_features(
             wordform_element)
+        key = tuple(gram_features.items())
+        if key not in self._shared_features:
+            self._shared_features[key] = features_view(gram_features)
+        gram_features = self._shared_features[key]
 
         # Compiles a general list of forms and a dict by each grammar name
         representations: List[Representation] = []
@@ -179,7 +218,7 @@ class XMLtoSloleksEntrys:
             norms.append(wordform_grammar_features.get("gender", "agender"))
 
         try:
-            norms.append(orthography_element.attrib['norm'])
+            norms.append(intern(orthography_element.attrib['norm']))
         except KeyError:
             pass
 
@@ -214,8 +253,8 @@ class XMLtoSloleksEntrys:
         pronunciations: defaultdict[str, str] = defaultdict(str)
         for pronunciation_element in pronunciation_elements:
             for form_element in pronunciation_element.findall('.//form'):
-                pronunciations[
-                    form_element.attrib['script']] += '\n' + form_element.text
+                pronunciations[intern(form_element.attrib['script'])] += (
+                    '\n' + form_element.text)
 
         return Representation(
             form_representation=form_representation,
@@ -228,14 +267,17 @@ class XMLtoSloleksEntrys:
     @staticmethod
     def _parse_grammatical_features(element: Et.Element) -> Dict[str, str]:
         """
-        Parses grammatical features from an ElementTree element.
+        Parses grammatical features from an ElementTree element. Names and
+        values come from a vocabulary of a few dozen strings, so they are
+        interned: every occurrence is the same str object, which keeps
+        entries and pickles small and makes equality checks identity checks.
 
         :param element: ElementTree element containing grammatical features.
         :return: Dictionary mapping feature names to their corresponding
             values.
         """
         return {
-            feature.get('name'): feature.text
+            intern(feature.get('name')): intern(feature.text)
             for feature in element.findall('.//grammarFeature')
         }
 
@@ -309,24 +351,99 @@ class LemmaFormsParser:
             json.dump(self.data, file, ensure_ascii=False, indent=4)
 
 
-def sloleks_to_pickles() -> None:
-    from tqdm import tqdm
-    import pickle
-    slolex_dir = os.path.abspath(os.path.join(proj_dir, 'data', 'Sloleks.3.0'))
+class FormLemmasParser:
+    """
+    Builds the reverse of LemmaFormsParser: each form_representation mapped
+    to the (lemma, part_of_speech, grammar_names) of every word form it
+    appears as. Saved with write_form_index and read with FormIndex.
+    """
 
-    xml_files = [f for f in os.listdir(slolex_dir) if f.endswith(".xml")]
+    def __init__(self, directory: str) -> None:
+        """
+        :param directory: The directory path containing XML files.
+        """
+        self.directory = directory
+        self.data: Dict[str, List[FormAnalysis]] = defaultdict(list)
+
+    def parse_xml_files(self) -> None:
+        """
+        Stream XML files in the specified directory and build the data
+        dictionary.
+        """
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".xml"):
+                filepath = os.path.join(self.directory, filename)
+                for entry in XMLtoSloleksEntrys(filepath, stream=True):
+                    for word_form in entry.all_forms:
+                        analysis = (entry.lemma, entry.part_of_speech,
+                                    word_form.grammar_names)
+                        for rep in word_form.representations:
+                            analyses = self.data[rep.form_representation]
+                            if analysis not in analyses:
+                                analyses.append(analysis)
+
+    def save_index(self, filepath: str) -> None:
+        """
+        Save the parsed data as a memory-mappable form index.
 
-    for filename in tqdm(xml_files, desc='Processing files'):
-        # Process the current XML file
-        entries = list(XMLtoSloleksEntrys(os.path.join(slolex_dir, filename)))
+        :param filepath: The file path to save the index to.
+        """
+        write_form_index(self.data, filepath)
 
-        # Save the entries as a pickle file with the same name as the XML file
-        pickle_file_path = os.path.join(
-            proj_dir, 'data', 'pickles', 'sloleksentry_objects',
-            os.path.splitext(filename)[0] + '.pkl'
-        )
-        with open(pickle_file_path, 'wb') as f:
-            pickle.dump(entries, f)
+
+def _xml_file_to_pickle(paths: Tuple[str, str]) -> str:
+    """
+    Parses one Sloleks XML file and pickles its SloleksEntry objects. Kept at
+    module level so it can be handed to pool workers.
+
+    :param paths: (xml file path, destination pickle path)
+    :return: Path of the processed XML file.
+    """
+    xml_path, pickle_path = paths
+    entries = list(XMLtoSloleksEntrys(xml_path, stream=True))
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(entries, f)
+    return xml_path
+
+
+def sloleks_to_pickles(processes: Optional[int] = 1) -> None:
+    """
+    Pickles the SloleksEntry objects of every XML file in data/Sloleks.3.0,
+    one .pkl per .xml (same file name) in data/pickles/sloleksentry_objects.
+
+    With more than one process the files are shared across a process pool.
+    Every worker parses and writes its own file, so the pickles are
+    identical to those of a serial run whatever order workers finish in.
+
+    :param processes: Number of worker processes. 1 runs serially in this
+        process, None uses every available core.
+    """
+    from tqdm import tqdm
+    import multiprocessing
+
+    slolex_dir = os.path.abspath(os.path.join(proj_dir, 'data', 'Sloleks.3.0'))
+    pickle_dir = os.path.join(
+        proj_dir, 'data', 'pickles', 'sloleksentry_objects')
+
+    xml_files = sorted(f for f in os.listdir(slolex_dir) if f.endswith(".xml"))
+    jobs: List[Tuple[str, str]] = [
+        (os.path.join(slolex_dir, filename),
+         os.path.join(pickle_dir, os.path.splitext(filename)[0] + '.pkl'))
+        for filename in xml_files
+    ]
+
+    if processes == 1:
+        for job in tqdm(jobs, desc='Processing files'):
+            _xml_file_to_pickle(job)
+        return
+
+    # Largest files first so no worker is left with a big file at the end
+    jobs.sort(key=lambda job: os.path.getsize(job[0]), reverse=True)
+    with multiprocessing.Pool(processes,
+                              initializer=configure_logging) as pool, \
+            tqdm(total=len(jobs), desc='Processing files') as pbar:
+        for _ in pool.imap_unordered(_xml_file_to_pickle, jobs):
+            pbar.update(1)
 
 
 # /SLOLEKS
@@ -341,38 +458,139 @@ class SskjEntry:
     :lemma: str
     :definitions: List[str]
     :sub_words: List[SskjEntry]
+    :header_qualifiers: List[str], unique in order of appearance; None on
+        entries pickled before it was parsed along with the rest
     """
     html: str
     accentuation: str
     lemma: str
     definitions: List[str]
     sub_words: List['SskjEntry']
+    header_qualifiers: List[str] = None
+
+    def content_hash(self) -> str:
+        """
+        Hash of (html, accentuation), the pair an SSKJ entry is deduplicated
+        on; fixed-size, so it can be indexed instead of the full HTML.
+
+        :return: hex digest
+        """
+        return hashlib.sha1(repr((self.html, self.accentuation)).encode(
+            'utf-8')).hexdigest()
 
 
 class HTMLParser:
     """
     self.sskjentrys is a list of all SskjEntry objects generated from given
     file
+
+    Public Methods:
+        iter_entries(html_path): Yields the SskjEntry objects of a file one
+        entry div at a time.
     """
+    # "lxml" streams the file through lxml.etree.iterparse, holding one entry
+    # div in memory at a time; "bs4" parses the whole file into a single
+    # BeautifulSoup tree. Both produce the same SskjEntry objects. "lxml"
+    # needs libxml2 >= 2.14 (lxml >= 6): older versions only know HTML4
+    # entity names and keep the html5 ones the scraper writes (&ccaron;,
+    # &zcaron;) as literal text, so bs4 is used instead on those.
+    backend: str = "lxml"
+    LIBXML_MIN_VERSION: Tuple[int, int] = (2, 14)
+
+    # Elements BeautifulSoup writes as <tag/> when empty
+    VOID_TAGS: Set[str] = {
+        'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+        'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+        'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+        'nextid', 'spacer'
+    }
 
     def __init__(
             self,
             html_path: str,
-            save_path: str = None
+            save_path: str = None,
+            processes: Optional[int] = 1
     ) -> None:
         """
         Initializes an HTMLParser instance for a given HTML file path.
 
         :param html_file: Path to the HTML file to parse.
         :param save_path: Saves file if path is given
+        :param processes: Number of worker processes. 1 streams the file in
+            this process, None uses every available core; see
+            parse_sskj_html_sharded.
         """
         if os.path.exists(html_path):
-            content: str = self._html_content(html_path)
-            soup: BeautifulSoup = self._parse_html(content)
-            self.sskjentrys: List[SskjEntry] = self._soup_to_sskjentrys(soup)
+            self.sskjentrys: List[SskjEntry] = (
+                list(self.iter_entries(html_path)) if processes == 1
+                else parse_sskj_html_sharded(html_path, processes))
             if save_path:
                 self._save_pickle(self.sskjentrys, save_path)
 
+    @classmethod
+    def iter_entries(cls, html_path: str) -> Iterator[SskjEntry]:
+        """
+        Yields, per entry div, the head word followed by its sub words, in
+        file order.
+
+        :param html_path: Path to a scraped SSKJ HTML file.
+        """
+        if cls.resolved_backend() == "bs4":
+            content: str = cls._html_content(html_path)
+            soup: 'BeautifulSoup' = cls._parse_html(content)
+            yield from cls._soup_to_sskjentrys(soup)
+            return
+
+        yield from cls._iter_lxml_entries(html_path)
+
+    @classmethod
+    def resolved_backend(cls) -> str:
+        """
+        :return: cls.backend, or "bs4" if it is "lxml" but the installed
+            libxml2 is older than LIBXML_MIN_VERSION
+        """
+        if cls.backend == "lxml":
+            from lxml import etree
+            if etree.LIBXML_VERSION < cls.LIBXML_MIN_VERSION:
+                logger.warning(
+                    f'libxml2 {etree.LIBXML_VERSION} cannot decode html5 '
+                    f'entities, parsing SSKJ HTML with bs4 (needs lxml>=6)')
+                return "bs4"
+        return cls.backend
+
+    @classmethod
+    def parse_shard(cls, html_path: str, start: int, end: int
+                    ) -> List[SskjEntry]:
+        """
+        Parses bytes [start, end) of an SSKJ HTML file, a range cut at entry
+        boundaries by sskj_entry_byte_ranges.
+        """
+        with open(html_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        if cls.resolved_backend() == "bs4":
+            return cls._soup_to_sskjentrys(
+                cls._parse_html(data.decode('utf-8')))
+        return list(cls._iter_lxml_entries(io.BytesIO(data)))
+
+    @classmethod
+    def _iter_lxml_entries(cls, source) -> Iterator[SskjEntry]:
+        """
+        :param source: File path or binary file object of SSKJ HTML.
+        """
+        from lxml import etree
+        context = etree.iterparse(source, events=('end',), tag='div',
+                                  html=True, encoding='utf-8')
+        for _, elem in context:
+            if elem.get('class', '').split() != ['list-group-item', 'entry']:
+                continue
+            yield from cls._element_to_sskjentrys(elem)
+
+            # Drop the finished entry and everything before it
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
     @staticmethod
     def _html_content(filepath: str) -> str:
         with open(filepath, 'r', encoding='utf-8') as file:
@@ -381,10 +599,13 @@ class HTMLParser:
         return html_content
 
     @staticmethod
-    def _parse_html(html_content: str) -> BeautifulSoup:
+    def _parse_html(html_content: str) -> 'BeautifulSoup':
+        from bs4 import BeautifulSoup
         return BeautifulSoup(html_content, 'html.parser')
 
-    def _soup_to_sskjentrys(self, soup: BeautifulSoup) -> List[SskjEntry]:
+    @classmethod
+    def _soup_to_sskjentrys(cls, soup: 'BeautifulSoup') -> List[SskjEntry]:
+        from bs4 import BeautifulSoup
         entries = soup.find_all("div", class_="list-group-item entry")
         all_sskjentrys = []
         for entry in entries:
@@ -392,15 +613,15 @@ class HTMLParser:
             orange_entries = entry_clone.find_all("ul", class_="manual")
 
             # Now pass each <ul class="manual"> individually
-            sub_words: List[SskjEntry] = [self._html_to_sskjentry(ul) for ul in
+            sub_words: List[SskjEntry] = [cls._html_to_sskjentry(ul) for ul in
                                           orange_entries]
 
             # Remove all <ul class="manual"> elements from the clone and
             # finally create clone entry with all subwords
             for ul in orange_entries:
                 ul.decompose()
-            head_word = self._html_to_sskjentry(html=entry_clone,
-                                                sub_words=sub_words)
+            head_word = cls._html_to_sskjentry(html=entry_clone,
+                                               sub_words=sub_words)
 
             all_sskjentrys.extend([head_word] + sub_words)
 
@@ -408,7 +629,7 @@ class HTMLParser:
 
     @staticmethod
     def _html_to_sskjentry(
-            html: BeautifulSoup,
+            html: 'BeautifulSoup',
             sub_words: List[SskjEntry] = None
     ) -> SskjEntry:
         try:
@@ -424,14 +645,163 @@ class HTMLParser:
             for span in
             html.find_all("span", {"data-group": "explanation "})
         ]
+        header_qualifiers = list(dict.fromkeys(
+            tag.get_text().strip() for tag in
+            html.find_all(attrs={"data-group": "header qualifier"})))
         return SskjEntry(
             html=str(html),
             lemma=lemma,
             accentuation=accentuation,
             definitions=explanations,
-            sub_words=sub_words
+            sub_words=sub_words,
+            header_qualifiers=header_qualifiers
+        )
+
+    @classmethod
+    def _element_to_sskjentrys(cls, entry) -> List[SskjEntry]:
+        """
+        lxml counterpart of _soup_to_sskjentrys for one entry div. The
+        element is modified in place (sub word lists are cut out of it)
+        instead of being cloned first.
+
+        :param entry: lxml element of a "list-group-item entry" div
+        :return: head word followed by its sub words
+        """
+        cls._collapse_whitespace(entry)
+        orange_entries = [ul for ul in entry.iter('ul')
+                          if 'manual' in ul.get('class', '').split()]
+        sub_words: List[SskjEntry] = [cls._element_to_sskjentry(ul)
+                                      for ul in orange_entries]
+        for ul in orange_entries:
+            cls._remove_element(ul)
+        head_word = cls._element_to_sskjentry(entry, sub_words=sub_words)
+        return [head_word] + sub_words
+
+    @classmethod
+    def _element_to_sskjentry(
+            cls,
+            html,
+            sub_words: List[SskjEntry] = None
+    ) -> SskjEntry:
+        spans = list(html.iter('span'))
+        accentuation_span = next(
+            (span for span in spans
+             if 'font_xlarge' in span.get('class', '').split()), None)
+        if accentuation_span is None:
+            accentuation_span = next(
+                span for span in spans
+                if 'color_orange' in span.get('class', '').split())
+        accentuation = cls._element_text(accentuation_span)
+        explanations = [
+            re.sub(r'\s+', ' ', cls._element_text(span))
+            for span in spans
+            if span.get('data-group') == "explanation "
+        ]
+        header_qualifiers = list(dict.fromkeys(
+            ''.join(element.itertext()).strip() for element in html.iter()
+            if element.get('data-group') == "header qualifier"))
+        return SskjEntry(
+            html=cls._element_html(html),
+            lemma=de_critic(accentuation),
+            accentuation=accentuation,
+            definitions=explanations,
+            sub_words=sub_words,
+            header_qualifiers=header_qualifiers
         )
 
+    @staticmethod
+    def _collapse_whitespace(entry) -> None:
+        """
+        BeautifulSoup turns every whitespace-only string outside <pre> and
+        <textarea> into a single newline, or a single space if it holds no
+        newline; does the same to the text and tails of an lxml subtree.
+        """
+        def collapse(text: Optional[str]) -> Optional[str]:
+            if text and not text.strip(' \n\t\f\r'):
+                return '\n' if '\n' in text else ' '
+            return text
+
+        preserved = set()
+        for block in entry.iter('pre', 'textarea'):
+            preserved.update(block.iter())
+        for elem in entry.iter():
+            if elem not in preserved:
+                elem.text = collapse(elem.text)
+            if elem is not entry and elem.getparent() not in preserved:
+                elem.tail = collapse(elem.tail)
+
+    @staticmethod
+    def _remove_element(elem) -> None:
+        """
+        Removes elem from its parent, keeping its tail text in place the way
+        BeautifulSoup's decompose() does.
+        """
+        parent = elem.getparent()
+        if elem.tail:
+            previous = elem.getprevious()
+            if previous is not None:
+                previous.tail = (previous.tail or '') + elem.tail
+            else:
+                parent.text = (parent.text or '') + elem.tail
+        parent.remove(elem)
+
+    @staticmethod
+    def _element_text(elem) -> str:
+        """
+        Same as BeautifulSoup's get_text(strip=True).
+        """
+        return ''.join(text.strip() for text in elem.itertext()
+                       if text.strip())
+
+    @classmethod
+    def _element_html(cls, elem) -> str:
+        """
+        Serialises an lxml element exactly like str() of the matching
+        BeautifulSoup tag, so SskjEntry.html does not depend on the backend.
+        """
+        parts: List[str] = []
+        cls._write_element(elem, parts)
+        return ''.join(parts)
+
+    @classmethod
+    def _write_element(cls, elem, parts: List[str]) -> None:
+        tag = elem.tag
+        if not isinstance(tag, str):
+            # Comments; processing instructions do not occur in SSKJ HTML
+            if tag.__name__ == 'Comment':
+                parts.append(f'<!--{elem.text or ""}-->')
+            return
+
+        parts.append(f'<{tag}')
+        for name, value in elem.attrib.items():
+            if name == 'class':
+                value = ' '.join(value.split())
+            value = (value.replace('&', '&amp;').replace('<', '&lt;')
+                     .replace('>', '&gt;'))
+            if '"' not in value:
+                parts.append(f' {name}="{value}"')
+            elif "'" not in value:
+                parts.append(f" {name}='{value}'")
+            else:
+                parts.append(f' {name}="{value.replace(chr(34), "&quot;")}"')
+
+        if tag in cls.VOID_TAGS and not elem.text and not len(elem):
+            parts.append('/>')
+            return
+        parts.append('>')
+        if elem.text:
+            parts.append(cls._escape_text(elem.text))
+        for child in elem:
+            cls._write_element(child, parts)
+            if child.tail:
+                parts.append(cls._escape_text(child.tail))
+        parts.append(f'</{tag}>')
+
+    @staticmethod
+    def _escape_text(text: str) -> str:
+        return (text.replace('&', '&amp;').replace('<', '&lt;')
+                .replace('>', '&gt;'))
+
     @staticmethod
     def _save_pickle(
             data: ...,
@@ -443,6 +813,82 @@ class HTMLParser:
 
 
 
+# Every SSKJ entry starts with this tag, at the top level of the body
+SSKJ_ENTRY_START: bytes = b'<div class="list-group-item entry"'
+
+
+def sskj_entry_byte_ranges(
+        html_path: str,
+        shards: int
+) -> List[Tuple[int, int]]:
+    """
+    Cuts an SSKJ HTML file into at most ``shards`` byte ranges of roughly
+    equal size, each starting at an entry div (the first one also holds the
+    document head), so every range parses on its own.
+
+    :param html_path: scraped SSKJ HTML file
+    :param shards: wanted number of ranges
+    :return: [(start, end), ...] covering the whole file, in file order
+    """
+    size = os.path.getsize(html_path)
+    if size == 0:
+        return []
+    boundaries = [0]
+    with open(html_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        for i in range(1, shards):
+            position = buf.find(SSKJ_ENTRY_START,
+                                max(size * i // shards, boundaries[-1] + 1))
+            if position == -1:
+                break
+            boundaries.append(position)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _parse_sskj_shard(job: Tuple[str, int, int, str]) -> List[SskjEntry]:
+    """
+    Parses one byte range of an SSKJ HTML file. Kept at module level so it
+    can be handed to pool workers.
+
+    :param job: (html file path, start, end, HTMLParser.backend)
+    :return: SskjEntry objects of the range, in file order.
+    """
+    html_path, start, end, backend = job
+    HTMLParser.backend = backend
+    return HTMLParser.parse_shard(html_path, start, end)
+
+
+def parse_sskj_html_sharded(
+        html_path: str,
+        processes: Optional[int] = None,
+        shards_per_process: int = 4
+) -> List[SskjEntry]:
+    """
+    Parses an SSKJ HTML file in parallel. The file is a concatenation of
+    independent entry divs, so it is cut into entry-aligned byte ranges
+    that pool workers parse separately; the results are concatenated in
+    file order and equal a serial HTMLParser run.
+
+    :param html_path: scraped SSKJ HTML file
+    :param processes: Number of worker processes, None uses every available
+        core.
+    :param shards_per_process: ranges per worker, so that a worker stuck
+        with slow entries does not hold up the others
+    :return: SskjEntry objects in file order
+    """
+    import multiprocessing
+
+    shard_count = (processes or os.cpu_count() or 1) * shards_per_process
+    jobs = [(html_path, start, end, HTMLParser.backend)
+            for start, end in sskj_entry_byte_ranges(html_path, shard_count)]
+    entries: List[SskjEntry] = []
+    with multiprocessing.Pool(processes,
+                              initializer=configure_logging) as pool:
+        for shard_entries in pool.imap(_parse_sskj_shard, jobs):
+            entries.extend(shard_entries)
+    return entries
+
 
 def get_sskjentrys(pkl_path) -> List[SskjEntry]:
     """
@@ -458,6 +904,7 @@ def get_sskjentrys(pkl_path) -> List[SskjEntry]:
 # /SSKJ
 
 if __name__ == "__main__":
+    configure_logging()
     pkl_dir = os.path.abspath(
         os.path.join(proj_dir, 'data', 'pickles', 'sskj_html_objs'))
     all_sskjentrys: List[SskjEntry] = get_sskjentrys(pkl_dir)
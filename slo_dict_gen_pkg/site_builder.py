@@ -0,0 +1,127 @@
+from common.imports import *
+from slo_dict_gen_pkg.parsers import XMLtoSloleksEntrys
+from slo_dict_gen_pkg.formatting import Definition, HTMLib
+from utils.sqlite_utils import SloleksLookup
+
+from tqdm import tqdm
+
+import multiprocessing
+import argparse
+import json
+
+ASSET_DIR: str = 'assets'
+MANIFEST: str = 'manifest.json'
+
+
+def _render_xml_file(job: Tuple[str, str, str, Optional[str]]
+                     ) -> List[Dict[str, str]]:
+    """
+    Renders every entry of one Sloleks XML file into its own shard directory,
+    named after the XML file. Kept at module level so it can be handed to
+    pool workers.
+
+    :param job: (xml file path, site output directory, HTMLib backend,
+        sloleks.db with RepresentationStats or None)
+    :return: Manifest rows of the written pages, in XML order.
+    """
+    xml_path, output_directory, backend, db_path = job
+    HTMLib.backend = backend
+    shard = os.path.splitext(os.path.basename(xml_path))[0]
+    os.makedirs(os.path.join(output_directory, shard), exist_ok=True)
+
+    lookup = SloleksLookup(db_path) if db_path else None
+    rows: List[Dict[str, str]] = []
+    used_names: Set[str] = set()
+    for entry in XMLtoSloleksEntrys(xml_path, stream=True):
+        if lookup:
+            lookup.apply_rare_flags(entry)
+        # Homographs of the same part of speech get a running number, and so
+        # do names differing only in case (Luna/luna), which would be one
+        # file on the case-insensitive filesystems of Windows and macOS
+        stem = f'{entry.lemma}_{entry.part_of_speech}'.replace(os.sep, '_')
+        name, n = stem, 1
+        while name.lower() in used_names:
+            n += 1
+            name = f'{stem}_{n}'
+        used_names.add(name.lower())
+
+        page_path = os.path.join(shard, f'{name}.html')
+        page = str(Definition(entry, asset_url=f'../{ASSET_DIR}'))
+        with open(os.path.join(output_directory, page_path), 'w',
+                  encoding='utf-8') as f:
+            f.write(page)
+        rows.append({
+            'lemma': entry.lemma,
+            'part_of_speech': entry.part_of_speech,
+            'path': page_path.replace(os.sep, '/')
+        })
+    if lookup:
+        lookup.close()
+    return rows
+
+
+def build_site(
+        xml_directory: str,
+        output_directory: str,
+        processes: Optional[int] = None,
+        backend: str = HTMLib.backend,
+        db_path: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """
+    Renders a Definition page for every entry of every Sloleks XML file in
+    xml_directory. Each XML file is one unit of work for the process pool and
+    gets its own shard directory; the shared CSS/JS are written once to
+    output_directory/assets and linked from every page. Writes
+    manifest.json listing (lemma, part_of_speech, path) for every page in
+    sorted file order, so the output does not depend on worker scheduling.
+
+    Entries are rendered from XML rather than sloleks.db because the db only
+    keeps the rendered inflection section, not the full entry.
+
+    :param xml_directory: directory with Sloleks XML files
+    :param output_directory: site root
+    :param processes: worker count, None uses every available core
+    :param backend: HTMLib.backend used by the workers
+    :param db_path: sloleks.db holding RepresentationStats (see
+        columnar_utils.store_frequency_statistics); forms flagged rare there
+        are grayed out. None grays unattested forms only.
+    :return: manifest rows
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    HTMLib.write_assets(os.path.join(output_directory, ASSET_DIR))
+
+    jobs = [(os.path.join(xml_directory, f), output_directory, backend,
+             db_path)
+            for f in sorted(os.listdir(xml_directory)) if f.endswith('.xml')]
+
+    manifest: List[Dict[str, str]] = []
+    # Spawned workers (macOS/Windows) start with logging unconfigured
+    with multiprocessing.Pool(processes, initializer=configure_logging) \
+            as pool:
+        for rows in tqdm(pool.imap(_render_xml_file, jobs), total=len(jobs),
+                         desc='Rendering files'):
+            manifest.extend(rows)
+
+    with open(os.path.join(output_directory, MANIFEST), 'w',
+              encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+if __name__ == "__main__":
+    configure_logging()
+    arg_parser = argparse.ArgumentParser(
+        description='Render every Sloleks entry into a static Definition page')
+    arg_parser.add_argument(
+        '--xml-dir', default=os.path.join(proj_dir, 'data', 'Sloleks.3.0'))
+    arg_parser.add_argument(
+        '--out-dir', default=os.path.join(proj_dir, 'data', 'html', 'site'))
+    arg_parser.add_argument('--processes', type=int, default=None)
+    arg_parser.add_argument('--backend', choices=('airium', 'template'),
+                            default=HTMLib.backend)
+    arg_parser.add_argument('--db', default=None,
+                            help='sloleks.db with precomputed rare flags')
+    args = arg_parser.parse_args()
+
+    build_site(args.xml_dir, args.out_dir, args.processes, args.backend,
+               args.db)
@@ -1,14 +1,49 @@
 from collections import defaultdict
-from dataclasses import dataclass
-from typing import Dict, List
+from dataclasses import dataclass, field, fields, MISSING
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+import hashlib
+import copyreg
 
 from utils.grammar_utils import ordered_grammar_name
 
 
-@dataclass()
+def features_view(features: Dict[str, str]) -> Mapping[str, str]:
+    """
+    Read-only view of a grammatical_features dict, shared between word forms
+    """
+    return MappingProxyType(features)
+
+
+# mappingproxy cannot be pickled by itself: pickle a view as its dict, to
+# be wrapped again on load. The pickle memo keeps one copy per shared view,
+# so the sharing survives a round trip.
+copyreg.pickle(MappingProxyType,
+               lambda view: (features_view, (dict(view),)))
+
+
+def _setstate(self, state) -> None:
+    """
+    __setstate__ of the slotted classes below. Besides their own
+    (None, {slot: value}) state it accepts the plain __dict__ state of
+    objects pickled before they were slotted; fields such pickles lack get
+    their defaults.
+    """
+    if isinstance(state, tuple):
+        state = state[1]
+    for f in fields(self):
+        if f.name in state:
+            setattr(self, f.name, state[f.name])
+        elif f.default is not MISSING:
+            setattr(self, f.name, f.default)
+
+
+@dataclass(slots=True)
 class SloleksEntry:
     """
-    Represents an entry in the Sloleks database.
+    Represents an entry in the Sloleks database. Slotted, like WordForm and
+    Representation: a full lexicon holds millions of these objects and a
+    per-instance __dict__ would dominate memory.
 
     Instance Variables:
         lemma (str)
@@ -46,8 +81,32 @@ class SloleksEntry:
                 self.all_reps.append(representation)
                 self.reps_dict[word_form.grammar_names].append(representation)
 
+    def content_hash(self) -> str:
+        """
+        Hash of the entry's parsed source data (everything but xml_file).
+        Equal hashes mean an unchanged entry, e.g. across Sloleks releases.
+
+        :return: hex digest
+        """
+        digest = hashlib.sha1(repr((
+            self.lemma,
+            self.part_of_speech,
+            sorted(self.lemma_grammatical_features.items())
+        )).encode('utf-8'))
+        for word_form in self.all_forms:
+            digest.update(repr((
+                word_form.msd,
+                sorted(word_form.grammatical_features.items()),
+                [(rep.form_representation, rep.norms, rep.frequency,
+                  rep.accentuations, sorted(rep.pronunciation_dict.items()))
+                 for rep in word_form.representations]
+            )).encode('utf-8'))
+        return digest.hexdigest()
+
+    __setstate__ = _setstate
 
-@dataclass()
+
+@dataclass(slots=True)
 class WordForm:
     """
     Represents a word form with associated grammatical information.
@@ -81,8 +140,13 @@ class WordForm:
 
         gender (str): Grammatical gender.
 
-        grammar_name (str): Grammar name used for indexing WordForms within
-        Entry.
+        grammar_names (Tuple[str]): Grammar names used for indexing
+        WordForms within Entry.
+
+    lemma and part_of_speech are the parent entry's own str objects, and
+    the parser shares one grammatical_features mapping between all word
+    forms with identical features, so neither is duplicated per form. It is
+    a read-only MappingProxyType for that reason.
     """
     # info from parent entry
     lemma: str
@@ -98,7 +162,7 @@ class WordForm:
     representations: List['Representation']
 
     #
-    grammatical_features: Dict[str, str]
+    grammatical_features: Mapping[str, str]
 
     # Vars to be pulled from grammatical_features & pronunciation_data
     v_form: str = None
@@ -108,6 +172,8 @@ class WordForm:
     gender: str = None
     degree: str = None
     clitic: str = None
+    grammar_names: Tuple[str, ...] = field(default=None, init=False,
+                                           repr=False, compare=False)
 
     def __post_init__(self):
         self.v_form = self.grammatical_features.get("vform", None)
@@ -134,11 +200,18 @@ class WordForm:
             return_type="tuple"
         )
 
+    __setstate__ = _setstate
 
-@dataclass()
+
+@dataclass(slots=True)
 class Representation:
     form_representation: str
     norms: List[str]
     frequency: int
     accentuations: List[str]
     pronunciation_dict: dict
+    # Precomputed rare-form flag (see columnar_utils.frequency_statistics);
+    # None until SloleksLookup.apply_rare_flags sets it
+    rare: Optional[bool] = field(default=None, repr=False, compare=False)
+
+    __setstate__ = _setstate
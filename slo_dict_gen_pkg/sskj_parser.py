@@ -127,6 +127,7 @@ def get_sskjentrys() -> List[SskjEntry]:
     return all_objs
 
 if __name__ == "__main__":
+    configure_logging()
     data_path = r"C:\Users\sangha\Documents\Danny's\SloDictGen\data"
     html_path = data_path + r"\html\SSKJ_entries_html"
     pkl_path = data_path + r"\pickles\html_objects"
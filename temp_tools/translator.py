@@ -192,6 +192,9 @@ def main_translate_sequence() -> None:
 
     :return: None
     """
+    # failed GPT calls are only recorded in general_issues.log
+    configure_logging()
+
     translation_station = os.path.abspath(os.path.join(
         proj_dir, 'data', 'db', 'translation_station'))
 
@@ -0,0 +1,370 @@
+from common.imports import *
+from slo_dict_gen_pkg import XMLtoSloleksEntrys, SloleksEntry, SskjEntry
+from slo_dict_gen_pkg.formatting import InflectionSection, Definition, HTMLib
+from slo_dict_gen_pkg.parsers import HTMLParser, parse_sskj_html_sharded
+from utils.sqlite_utils import SloleksToSQLite, SskjSearch, sskj_entries_db
+from utils import grammar_utils
+from slo_dict_gen_pkg import grammar_utils as pkg_grammar_utils
+
+from unidecode import unidecode
+
+import multiprocessing
+import pickle
+import subprocess
+import resource
+import tracemalloc
+import tempfile
+import sqlite3
+import time
+import sys
+
+sample_xml: str = os.path.abspath(os.path.join(
+    proj_dir, 'data', 'xml', 'sloleks_3.0_sample.xml'))
+full_xml: str = os.path.abspath(os.path.join(
+    proj_dir, 'data', 'Sloleks.3.0', 'sloleks_3.0_001.xml'))
+sskj_html: str = os.path.abspath(os.path.join(
+    proj_dir, 'data', 'html', 'sskj', 'si_sskj.html'))
+sskj_pickles: str = os.path.abspath(os.path.join(
+    proj_dir, 'data', 'pickles', 'sskj_html_objs'))
+
+# Reverse-dictionary lookups: Slovenian and English words, an accented
+# query and a search-as-you-type prefix
+sskj_search_queries: List[Tuple[str, bool]] = [
+    ('velika žival', False),
+    ('large animal', False),
+    ('hítro', False),
+    ('živ', True),
+]
+
+# Import cost budgets of the entry points lookup workers start from, as
+# multiples of a bare `import common.imports` (typing, logging, dataclasses)
+# timed in the same interpreter, so the check holds on slow or busy machines
+import_budget_ratios: Dict[str, float] = {
+    'slo_dict_gen_pkg': 0.25,
+    'slo_dict_gen_pkg.form_index': 0.5,
+    'utils.sqlite_utils': 3.0,
+}
+# Modules none of those entry points may load on import
+deferred_modules: Tuple[str, ...] = (
+    'bs4', 'airium', 'tqdm', 'icecream', 'pyperclip')
+
+
+def benchmark_sloleks_inserts(
+        xml_path: str = sample_xml,
+        repeat: int = 50
+) -> Dict[str, float]:
+    """
+    Times SloleksToSQLite.insert_sloleks_entry against
+    SloleksToSQLite.bulk_insert_sloleks_entries, each loading the entries of
+    xml_path ``repeat`` times into a fresh on-disk database (index build
+    included). Both paths render every entry's InflectionSection, so the
+    time spent on rendering alone is reported as well; subtract it to get
+    the database cost of each path.
+
+    :param xml_path: Sloleks XML file to load
+    :param repeat: number of times the file's entries are inserted
+    :return: seconds taken per insert path
+    """
+    entries: List[SloleksEntry] = list(XMLtoSloleksEntrys(xml_path))
+    results: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in entries:
+            str(InflectionSection(entry))
+    results['render only'] = time.perf_counter() - start
+
+    for name, bulk in (('row-by-row', False), ('bulk', True)):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conn = sqlite3.connect(os.path.join(tmp_dir, 'bench.db'))
+            SloleksToSQLite.create_tables(conn)
+            if bulk:
+                SloleksToSQLite.set_bulk_load_pragmas(conn)
+            insert = (SloleksToSQLite.bulk_insert_sloleks_entries if bulk
+                      else SloleksToSQLite.insert_sloleks_entry)
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                insert(conn, entries)
+            SloleksToSQLite.create_indexes(conn)
+            if bulk:
+                SloleksToSQLite.finish_bulk_load(conn)
+            results[name] = time.perf_counter() - start
+            conn.close()
+
+    for name, seconds in results.items():
+        print(f'{name:<12}: {seconds:.3f}s '
+              f'({len(entries) * repeat} entries)')
+    return results
+
+
+def benchmark_renderers(
+        xml_path: str = sample_xml,
+        repeat: int = 20
+) -> Dict[str, float]:
+    """
+    Times full Definition pages rendered with each HTMLib.backend and checks
+    that both produce the same markup.
+
+    :param xml_path: Sloleks XML file whose entries are rendered
+    :param repeat: number of times every entry is rendered per backend
+    :return: milliseconds per entry for each backend
+    """
+    entries: List[SloleksEntry] = list(XMLtoSloleksEntrys(xml_path))
+    results: Dict[str, float] = {}
+    pages: Dict[str, List[str]] = {}
+    original_backend = HTMLib.backend
+
+    try:
+        for backend in ('airium', 'template'):
+            HTMLib.backend = backend
+            start = time.perf_counter()
+            for _ in range(repeat):
+                pages[backend] = [str(Definition(entry)) for entry in entries]
+            results[backend] = ((time.perf_counter() - start) * 1000
+                                / (len(entries) * repeat))
+    finally:
+        HTMLib.backend = original_backend
+
+    if pages['airium'] != pages['template']:
+        raise AssertionError("template backend markup differs from Airium")
+    for backend, ms in results.items():
+        print(f'{backend:<12}: {ms:.3f}ms per entry')
+    print(f'speedup     : {results["airium"] / results["template"]:.2f}x')
+    return results
+
+
+def benchmark_entry_memory(xml_path: str = full_xml) -> Dict[str, int]:
+    """
+    Measures the memory held by the SloleksEntry objects of one Sloleks XML
+    file (a full Sloleks 3.0 file by default, the sample if it is absent),
+    parsed in streaming mode so the ElementTree itself is not counted.
+
+    :param xml_path: Sloleks XML file to load
+    :return: retained and peak bytes, plus entry and representation counts
+    """
+    if not os.path.exists(xml_path):
+        xml_path = sample_xml
+
+    tracemalloc.start()
+    try:
+        entries: List[SloleksEntry] = list(
+            XMLtoSloleksEntrys(xml_path, stream=True))
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    representations = sum(len(entry.all_reps) for entry in entries)
+    print(f'{os.path.basename(xml_path)}: {len(entries)} entries, '
+          f'{representations} representations')
+    print(f'retained    : {retained / 2 ** 20:.1f} MiB '
+          f'({retained / max(representations, 1):.0f} B per representation)')
+    print(f'peak        : {peak / 2 ** 20:.1f} MiB')
+    return {'retained': retained, 'peak': peak, 'entries': len(entries),
+            'representations': representations}
+
+
+def _parse_sskj_html(job: Tuple[str, str]) -> Tuple[float, int, list]:
+    """
+    Runs in a fresh spawned process so ru_maxrss is the parser's own peak.
+
+    :param job: (HTML file path, HTMLParser.backend)
+    :return: seconds, peak RSS in KiB, parsed SskjEntry objects
+    """
+    html_path, backend = job
+    HTMLParser.backend = backend
+    start = time.perf_counter()
+    entries = HTMLParser(html_path).sskjentrys
+    seconds = time.perf_counter() - start
+    return (seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            entries)
+
+
+def benchmark_sskj_parsers(html_path: str = sskj_html) -> Dict[str, float]:
+    """
+    Parses a scraped SSKJ HTML file with each HTMLParser.backend, each in its
+    own process, then with parse_sskj_html_sharded on every core, and checks
+    that all three give the same SskjEntry objects.
+
+    :param html_path: scraped SSKJ HTML file (si_sskj.html or en_sskj.html)
+    :return: seconds per backend
+    """
+    results: Dict[str, float] = {}
+    entries: Dict[str, list] = {}
+    context = multiprocessing.get_context('spawn')
+    for backend in ('bs4', 'lxml'):
+        with context.Pool(1) as pool:
+            seconds, peak_kib, entries[backend] = pool.apply(
+                _parse_sskj_html, ((html_path, backend),))
+        results[backend] = seconds
+        print(f'{backend:<12}: {seconds:.2f}s, peak RSS '
+              f'{peak_kib / 1024:.0f} MiB ({len(entries[backend])} entries)')
+
+    start = time.perf_counter()
+    entries['sharded'] = parse_sskj_html_sharded(html_path)
+    results['sharded'] = time.perf_counter() - start
+    print(f'{"sharded":<12}: {results["sharded"]:.2f}s on '
+          f'{os.cpu_count()} cores')
+
+    if entries['bs4'] != entries['lxml']:
+        raise AssertionError("lxml backend entries differ from bs4")
+    if entries['sharded'] != entries['lxml']:
+        raise AssertionError("sharded parse differs from a serial one")
+    print(f'speedup     : {results["bs4"] / results["lxml"]:.2f}x')
+    return results
+
+
+def benchmark_sskj_search(
+        db_path: str = sskj_entries_db,
+        queries: List[Tuple[str, bool]] = None,
+        repeat: int = 100
+) -> Dict[str, float]:
+    """
+    Times SskjSearch.search on an sskj_entries.db with its sskj_search
+    index built.
+
+    :param db_path: sskj_entries.db built by SskjEntrystoSQLite
+    :param queries: (query, prefix) pairs, defaults to sskj_search_queries
+    :param repeat: searches per query
+    :return: milliseconds per search for each query
+    """
+    results: Dict[str, float] = {}
+    with SskjSearch(db_path) as search:
+        for query, prefix in queries or sskj_search_queries:
+            hits = search.search(query, prefix=prefix)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                search.search(query, prefix=prefix)
+            results[query] = (time.perf_counter() - start) * 1000 / repeat
+            print(f'{query + "*" * prefix:<16}: {results[query]:.3f}ms '
+                  f'({len(hits)} hits)')
+    return results
+
+
+def _de_critic_recursive(word: str, inpt: str = '') -> str:
+    """
+    de_critic as it was before the translation table, the reference
+    verify_de_critic compares against
+    """
+    if word:
+        if word[0] not in "čžšČŽŠ":
+            outpt = inpt + unidecode(word[0])
+        else:
+            outpt = inpt + word[0]
+        return _de_critic_recursive(word[1:], outpt)
+    else:
+        return inpt
+
+
+class _SskjPickleUnpickler(pickle.Unpickler):
+    """
+    The pickles in data/pickles/sskj_html_objs were written by a script run
+    as __main__, so their SskjEntry class has to be pointed at parsers.py
+    """
+    def find_class(self, module: str, name: str):
+        if module == '__main__' and name == 'SskjEntry':
+            return SskjEntry
+        return super().find_class(module, name)
+
+
+def verify_de_critic(pickle_dir: str = sskj_pickles) -> int:
+    """
+    Checks that de_critic of both grammar_utils modules returns what the
+    old recursive implementation did for every lemma and accentuation of
+    the pickled SSKJ entries (head words and sub words).
+
+    :param pickle_dir: directory of pickled SskjEntry lists
+    :return: number of distinct strings checked
+    """
+    words: Set[str] = set()
+    pending = []
+    for file_name in sorted(os.listdir(pickle_dir)):
+        if file_name.endswith('.pkl'):
+            with open(os.path.join(pickle_dir, file_name), 'rb') as f:
+                pending.extend(_SskjPickleUnpickler(f).load())
+    while pending:
+        entry = pending.pop()
+        words.update(word for word in (entry.lemma, entry.accentuation)
+                     if word)
+        pending.extend(entry.sub_words or [])
+
+    mismatches = [word for word in sorted(words)
+                  if not (grammar_utils.de_critic(word)
+                          == pkg_grammar_utils.de_critic(word)
+                          == _de_critic_recursive(word))]
+    print(f'de_critic   : {len(words)} SSKJ lemmas and accentuations, '
+          f'{len(mismatches)} mismatches')
+    if mismatches:
+        raise AssertionError(f"de_critic differs from the recursive "
+                             f"implementation on {mismatches[:10]}")
+    return len(words)
+
+
+def benchmark_import_time(
+        budget_ratios: Dict[str, float] = None,
+        repeat: int = 5
+) -> Dict[str, float]:
+    """
+    Imports each module in a fresh interpreter under ``python -X importtime``,
+    right after a bare ``import common.imports``, and checks that:
+        - none of deferred_modules ends up in sys.modules
+        - the module's own cumulative import time, on top of common.imports,
+          stays within its budget ratio of the common.imports time measured
+          in the same run
+    The lowest ratio of ``repeat`` runs is kept.
+
+    :param budget_ratios: module -> budget as a multiple of the
+        common.imports import time, defaults to import_budget_ratios
+    :param repeat: interpreter runs per module
+    :return: import time ratio per module
+    """
+    budget_ratios = budget_ratios or import_budget_ratios
+    results: Dict[str, float] = {}
+    loaded: Dict[str, List[str]] = {}
+    for module, budget in budget_ratios.items():
+        code = (f'import common.imports; import {module}; import sys; '
+                f'print(*(name for name in {deferred_modules!r} '
+                f'if name in sys.modules))')
+        runs = []
+        for _ in range(repeat):
+            process = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', code],
+                cwd=proj_dir, capture_output=True, text=True, check=True)
+            # "import time: self [us] | cumulative | imported package";
+            # the un-indented line of a module holds its whole cost
+            cumulative_us = {
+                name.rstrip(): int(cumulative)
+                for _, cumulative, name in (
+                    line.rsplit('|', 2)
+                    for line in process.stderr.splitlines()[1:])}
+            runs.append(cumulative_us[f' {module}']
+                        / cumulative_us[' common.imports'])
+            loaded[module] = process.stdout.split()
+        results[module] = min(runs)
+        print(f'{module:<28}: {results[module]:5.2f}x common.imports '
+              f'(budget {budget}x)'
+              + (f', loaded {" ".join(loaded[module])}'
+                 if loaded[module] else ''))
+
+    problems = [f'{module} loads {", ".join(names)}'
+                for module, names in loaded.items() if names]
+    problems += [f'{module} over its import time budget'
+                 for module, ratio in results.items()
+                 if ratio > budget_ratios[module]]
+    if problems:
+        raise AssertionError('; '.join(problems))
+    return results
+
+
+if __name__ == "__main__":
+    configure_logging()
+    benchmark_sloleks_inserts()
+    benchmark_renderers()
+    benchmark_entry_memory()
+    benchmark_import_time()
+    if os.path.exists(sskj_pickles):
+        verify_de_critic()
+    if os.path.exists(sskj_html):
+        benchmark_sskj_parsers()
+    if os.path.exists(sskj_entries_db):
+        benchmark_sskj_search()
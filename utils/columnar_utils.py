@@ -0,0 +1,343 @@
+from common.imports import *
+from utils.sqlite_utils import sloleks_db, SloleksToSQLite, RARE_SHARE
+
+import numpy as np
+
+import tempfile
+import sqlite3
+import json
+
+# Dictionary-encoded columns: name -> SQL expression. Each becomes an int16
+# code array plus its category list in categories.json; -1 encodes NULL.
+CATEGORICAL_COLUMNS: Dict[str, str] = {
+    'part_of_speech': 'e.part_of_speech',
+    'msd': 'w.msd',
+    'v_form': 'w.v_form',
+    'case': 'w.grammatical_case',
+    'person': 'w.person',
+    'number': 'w.number',
+    'gender': 'w.gender',
+    'degree': 'w.degree',
+    'clitic': 'w.clitic',
+}
+INTEGER_COLUMNS: Dict[str, str] = {
+    'representation_id': 'r.id',
+    'frequency': 'r.frequency',
+    'sloleks_entry_id': 'r.sloleks_entry_id',
+    'word_form_id': 'r.word_form_id',
+}
+CATEGORIES: str = 'categories.json'
+FORMS_DATA: str = 'form_representation.bin'
+FORMS_OFFSETS: str = 'form_representation_offsets.npy'
+
+
+def export_representations(
+        out_dir: str,
+        db_path: str = sloleks_db,
+        chunk_size: int = 100_000
+) -> int:
+    """
+    Writes every Representation row of sloleks.db as column arrays in
+    out_dir, one .npy per column, so analytics can memory-map them instead
+    of pulling rows one by one:
+        - integer columns (frequency, ids) as int64 arrays
+        - grammar features and part of speech dictionary-encoded as int16
+          codes, their values listed in categories.json
+        - form_representation Arrow-style: UTF-8 bytes concatenated in
+          form_representation.bin with int64 start offsets (n + 1 values)
+
+    :param out_dir: destination directory
+    :param db_path: sloleks.db built by SloleksToSQLite
+    :param chunk_size: rows fetched from SQLite at a time
+    :return: number of rows exported
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    row_count = conn.execute('SELECT COUNT(*) FROM Representation'
+                             ).fetchone()[0]
+
+    integers = {name: np.lib.format.open_memmap(
+        os.path.join(out_dir, f'{name}.npy'), mode='w+', dtype=np.int64,
+        shape=(row_count,)) for name in INTEGER_COLUMNS}
+    codes = {name: np.lib.format.open_memmap(
+        os.path.join(out_dir, f'{name}.npy'), mode='w+', dtype=np.int16,
+        shape=(row_count,)) for name in CATEGORICAL_COLUMNS}
+    offsets = np.lib.format.open_memmap(
+        os.path.join(out_dir, FORMS_OFFSETS), mode='w+', dtype=np.int64,
+        shape=(row_count + 1,))
+    categories: Dict[str, Dict[str, int]] = {
+        name: {} for name in CATEGORICAL_COLUMNS}
+
+    columns = (list(INTEGER_COLUMNS.values())
+               + list(CATEGORICAL_COLUMNS.values())
+               + ['r.form_representation'])
+    cursor = conn.execute(f'''SELECT {', '.join(columns)}
+                              FROM Representation r
+                              JOIN WordForm w ON w.id = r.word_form_id
+                              JOIN SloleksEntry e ON e.id = r.sloleks_entry_id
+                              ORDER BY r.id''')
+
+    position = 0
+    byte_offset = 0
+    integer_count = len(INTEGER_COLUMNS)
+    with open(os.path.join(out_dir, FORMS_DATA), 'wb') as forms_file:
+        while rows := cursor.fetchmany(chunk_size):
+            end = position + len(rows)
+            for i, name in enumerate(INTEGER_COLUMNS):
+                integers[name][position:end] = [row[i] or 0 for row in rows]
+            for i, name in enumerate(CATEGORICAL_COLUMNS, integer_count):
+                lookup = categories[name]
+                codes[name][position:end] = [
+                    -1 if row[i] is None
+                    else lookup.setdefault(row[i], len(lookup))
+                    for row in rows]
+
+            encoded = [(row[-1] or '').encode('utf-8') for row in rows]
+            lengths = np.fromiter((len(form) for form in encoded),
+                                  dtype=np.int64, count=len(encoded))
+            offsets[position] = byte_offset
+            offsets[position + 1:end + 1] = byte_offset + np.cumsum(lengths)
+            byte_offset = int(offsets[end])
+            forms_file.write(b''.join(encoded))
+            position = end
+    conn.close()
+
+    for array in [*integers.values(), *codes.values(), offsets]:
+        array.flush()
+    with open(os.path.join(out_dir, CATEGORIES), 'w', encoding='utf-8') as f:
+        json.dump({name: list(lookup) for name, lookup in categories.items()},
+                  f, ensure_ascii=False, indent=4)
+    return row_count
+
+
+class ColumnarLexicon:
+    """
+    Memory-mapped view of a directory written by export_representations.
+    Arrays are opened read-only with mmap, so loading is instant and only
+    the columns an aggregation touches are read from disk.
+
+    Public Methods:
+        column(name): The int64/int16 array of a column.
+        codes_for(name, value): Category code of a feature value.
+        form(i): form_representation of row i.
+        frequency_by(*features): Summed frequency per feature value combo.
+    """
+
+    def __init__(self, directory: str):
+        self.directory: str = directory
+        with open(os.path.join(directory, CATEGORIES), encoding='utf-8') as f:
+            self.categories: Dict[str, List[str]] = json.load(f)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._forms: Optional[np.memmap] = None
+
+    def __len__(self):
+        return len(self.column('frequency'))
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = np.load(
+                os.path.join(self.directory, f'{name}.npy'), mmap_mode='r')
+        return self._columns[name]
+
+    def codes_for(self, name: str, value: Optional[str]) -> int:
+        return -1 if value is None else self.categories[name].index(value)
+
+    def form(self, i: int) -> str:
+        if self._forms is None:
+            path = os.path.join(self.directory, FORMS_DATA)
+            self._forms = (np.memmap(path, dtype=np.uint8, mode='r')
+                           if os.path.getsize(path)
+                           else np.zeros(0, dtype=np.uint8))
+        offsets = self.column('form_representation_offsets')
+        return bytes(self._forms[offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def frequency_by(self, *features: str) -> Dict[Tuple, int]:
+        """
+        Sums frequency over every combination of the given categorical
+        features in one vectorised pass, e.g. frequency_by('part_of_speech',
+        'case').
+
+        :param features: names of CATEGORICAL_COLUMNS
+        :return: (value, ...) -> total frequency; None stands for NULL and
+            combinations with zero total frequency are left out
+        """
+        # Shift codes by one so NULL (-1) gets its own bucket and fold the
+        # features into a single mixed-radix key. Keys are then renumbered
+        # to the combinations that occur, so bincount needs one slot per
+        # occurring combination rather than per possible one. Should the key
+        # space outgrow int64, keys are renumbered before the next feature.
+        keys = np.zeros(len(self), dtype=np.int64)
+        key_space = 1
+        for name in features:
+            size = len(self.categories[name]) + 1
+            if key_space * size > np.iinfo(np.int64).max:
+                distinct, keys = np.unique(keys, return_inverse=True)
+                key_space = len(distinct)
+            keys = keys * size + (self.column(name).astype(np.int64) + 1)
+            key_space *= size
+        if key_space <= len(self):
+            # A dense count is no larger than the columns and needs no sort
+            occurring = np.flatnonzero(np.bincount(keys,
+                                                   minlength=key_space))
+            renumbered = np.zeros(key_space, dtype=np.int64)
+            renumbered[occurring] = np.arange(len(occurring))
+            keys = renumbered[keys]
+        else:
+            occurring, keys = np.unique(keys, return_inverse=True)
+        totals = np.bincount(keys, weights=self.column('frequency'),
+                             minlength=len(occurring))
+
+        # Decode each combination from any row that has it
+        rows = np.zeros(len(occurring), dtype=np.int64)
+        rows[keys] = np.arange(len(keys))
+        codes = [self.column(name)[rows].tolist() for name in features]
+        results: Dict[Tuple, int] = {}
+        for i in np.flatnonzero(totals).tolist():
+            results[tuple(
+                None if combo_codes[i] == -1
+                else self.categories[name][combo_codes[i]]
+                for name, combo_codes in zip(features, codes))] = \
+                int(totals[i])
+        return results
+
+
+def frequency_statistics(
+        lexicon: ColumnarLexicon,
+        rare_share: float = RARE_SHARE
+) -> Dict[str, np.ndarray]:
+    """
+    Computes frequency statistics for every representation of the lexicon in
+    a handful of whole-array passes:
+        - lemma_total: summed frequency of the representation's entry
+        - lemma_share: frequency / lemma_total (0 for unattested lemmas)
+        - slot_percentile: percentage of representations with the same msd
+          (the same paradigm slot across the lexicon) whose frequency is
+          lower than or equal to this one
+        - rare: frequency == 0 or lemma_share < rare_share, the rule the db
+          writers apply per entry before rendering (see
+          SloleksToSQLite.set_rare_flags)
+
+    :param lexicon: ColumnarLexicon of an exported sloleks.db
+    :param rare_share: lemma share below which an attested form is rare
+    :return: statistic name -> array aligned with the lexicon rows
+    """
+    frequency = lexicon.column('frequency')
+    entry_ids = lexicon.column('sloleks_entry_id')
+
+    lemma_total = np.bincount(entry_ids, weights=frequency)[entry_ids]
+    lemma_share = np.divide(frequency, lemma_total,
+                            out=np.zeros(len(frequency)),
+                            where=lemma_total > 0)
+
+    # Sort by (msd, frequency); the rank of the last equal key minus the
+    # start of the msd group counts the group members with frequency <= own
+    msd = lexicon.column('msd').astype(np.int64) + 1
+    keys = msd * (int(frequency.max(initial=0)) + 1) + frequency
+    order = np.argsort(keys, kind='stable')
+    sorted_keys, sorted_msd = keys[order], msd[order]
+    group_start = np.searchsorted(sorted_msd, sorted_msd, side='left')
+    group_end = np.searchsorted(sorted_msd, sorted_msd, side='right')
+    at_or_below = np.searchsorted(sorted_keys, sorted_keys, side='right')
+    slot_percentile = np.empty(len(frequency))
+    slot_percentile[order] = (100 * (at_or_below - group_start)
+                              / (group_end - group_start))
+
+    rare = (frequency == 0) | (lemma_share < rare_share)
+    return {'lemma_total': lemma_total.astype(np.int64),
+            'lemma_share': lemma_share,
+            'slot_percentile': slot_percentile,
+            'rare': rare}
+
+
+def store_frequency_statistics(
+        lexicon: ColumnarLexicon,
+        stats: Dict[str, np.ndarray],
+        db_path: str = sloleks_db
+) -> None:
+    """
+    Saves the output of frequency_statistics next to the exported columns
+    (one .npy each) and into sloleks.db: every statistic in the
+    RepresentationStats table, replaced as a whole, and the rare flags of
+    each entry as a '0'/'1' string in SloleksEntry.rare_flags (one
+    character per representation, in id order), which
+    SloleksLookup.apply_rare_flags reads before rendering.
+    SloleksIncrementalUpdate refreshes both after it changes entries.
+
+    The db writers store the flags an entry's inflection_section was
+    rendered with. Rows whose flags change here (statistics computed with
+    another rare_share) get renderer_version NULL, so the next
+    SloleksIncrementalUpdate with that rare_share re-renders them.
+
+    :param lexicon: ColumnarLexicon the statistics were computed from
+    :param stats: output of frequency_statistics
+    :param db_path: sloleks.db the lexicon was exported from
+    """
+    for name, array in stats.items():
+        np.save(os.path.join(lexicon.directory, f'{name}.npy'), array)
+
+    # Group the flags by entry, representations in id order
+    entry_ids = lexicon.column('sloleks_entry_id')
+    order = np.lexsort((lexicon.column('representation_id'), entry_ids))
+    sorted_entry_ids = entry_ids[order]
+    flags = np.where(stats['rare'][order], ord('1'), ord('0')).astype(
+        np.uint8).tobytes().decode('ascii')
+    starts = np.flatnonzero(np.diff(sorted_entry_ids, prepend=-1))
+    ends = np.append(starts[1:], len(order))
+    rare_flags = [{'flags': flags[start:end],
+                   'id': int(sorted_entry_ids[start])}
+                  for start, end in zip(starts.tolist(), ends.tolist())]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        SloleksToSQLite.create_tables(conn)
+        conn.executemany('''UPDATE SloleksEntry
+                            SET renderer_version = CASE
+                                    WHEN rare_flags IS :flags
+                                    THEN renderer_version END,
+                                rare_flags = :flags
+                            WHERE id = :id''', rare_flags)
+        conn.execute('DROP TABLE IF EXISTS RepresentationStats')
+        conn.execute('''CREATE TABLE RepresentationStats (
+                            representation_id INTEGER PRIMARY KEY,
+                            lemma_total INTEGER,
+                            lemma_share REAL,
+                            slot_percentile REAL,
+                            rare INTEGER,
+                            FOREIGN KEY(representation_id)
+                                REFERENCES Representation(id)
+                        )''')
+        conn.executemany(
+            'INSERT INTO RepresentationStats VALUES (?, ?, ?, ?, ?)',
+            zip(lexicon.column('representation_id').tolist(),
+                stats['lemma_total'].tolist(),
+                stats['lemma_share'].tolist(),
+                stats['slot_percentile'].tolist(),
+                stats['rare'].astype(np.int64).tolist()))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def refresh_frequency_statistics(
+        db_path: str = sloleks_db,
+        rare_share: Optional[float] = None,
+        out_dir: Optional[str] = None
+) -> None:
+    """
+    Exports, computes and stores the frequency statistics of sloleks.db in
+    one go; see export_representations, frequency_statistics and
+    store_frequency_statistics.
+
+    :param db_path: sloleks.db built by SloleksToSQLite
+    :param rare_share: see frequency_statistics, None for RARE_SHARE
+    :param out_dir: directory for the column arrays, a temporary one that
+        is removed afterwards if None
+    """
+    rare_share = RARE_SHARE if rare_share is None else rare_share
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_dir = out_dir or tmp_dir
+        export_representations(out_dir, db_path)
+        lexicon = ColumnarLexicon(out_dir)
+        store_frequency_statistics(
+            lexicon, frequency_statistics(lexicon, rare_share), db_path)
+        del lexicon  # release its memory maps before the directory goes
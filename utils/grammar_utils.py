@@ -1,5 +1,6 @@
 from common.imports import *
 from unidecode import unidecode
+from functools import lru_cache
 import re
 
 ALPHA: str = "abcčdefghijklmnopqrsštuvwxyzž"
@@ -466,7 +467,47 @@ def concatenate_variables(*items):
     return out
 
 
-def return_gram_feat_type(sample: str) -> Union[str, None]:
+# Feature type of each gfcat category, in lookup priority order: a value
+# listed under several categories resolves to the first one here
+gram_feat_categories: Dict[str, str] = {
+    'aspect': 'aspect',
+    'number': 'number',
+    'negative': 'negative',
+    'case': 'case',
+    'animate': 'animate',
+    'definiteness': 'definiteness',
+    'type': 'word_type',  # 'participle' removed!
+    'person': 'person',
+    'degree': 'degree',
+    'vform': 'vform',
+    'gender': 'gender',
+    'form': 'form',
+    'clitic': 'clitic'
+}
+
+# Values shared by several features, resolved explicitly rather than by
+# priority order
+ambiguous_gram_feats: Dict[str, str] = {
+    'no': 'animate/negative',  # animate, negative, definiteness
+    'yes': 'clitic',  # negative, animate, definiteness, clitic
+}
+
+
+def _gram_feat_types() -> Dict[str, str]:
+    types: Dict[str, str] = {}
+    for feature, category in gram_feat_categories.items():
+        for value in gfcat[category]:
+            types.setdefault(value, feature)
+    types.update(ambiguous_gram_feats)
+    return types
+
+
+# Reverse map of gfcat: feature value -> feature type
+gram_feat_types: Dict[str, str] = _gram_feat_types()
+
+
+def return_gram_feat_type(sample: str, warn: bool = False
+                          ) -> Union[str, None]:
     """
     Takes a string and returns its grammar feature name.
 
@@ -476,60 +517,46 @@ def return_gram_feat_type(sample: str) -> Union[str, None]:
         "nominative" -> "case"
 
     :param sample: (str) sample word to check for feature type
+    :param warn: log ambiguous ("yes"/"no"), "participle" and unknown values
     :return: string of feature type
     """
-    gram_feat_dict = {
-        'aspect': gfcat['aspect'],
-        'number': gfcat['number'],
-        'negative': gfcat['negative'],
-        'case': gfcat['case'],
-        'animate': gfcat['animate'],
-        'definiteness': gfcat['definiteness'],
-        'type': gfcat['word_type'],  # 'participle' removed!
-        'person': gfcat['person'],
-        'degree': gfcat['degree'],
-        'vform': gfcat['vform'],
-        'gender': gfcat['gender'],
-        'form': gfcat['form'],
-        'clitic': gfcat['clitic']
-    }
-
-    for key, values in gram_feat_dict.items():
-        if sample == "no":
-            lg.warning("'no' appears in two grammar features")
-            return_value = "animate/negative"
-            return ic([sample, return_value])[1]
-        if sample == "yes":
-            lg.info("'yes' appears in three grammar features")
-            return_value = "clitic"
-            return ic([sample, return_value])[1]
-        if sample in values:
-            if sample in {"participle"}:
-                lg.warning('"participle" removed from "type" feature '
-                           'for functionality')
-            return key
-    if sample not in {'form'}:
-        lg.warning(f'"{sample}" not a known grammar feature.')
-    return None
-
-
-def de_critic(word: str, inpt: str = ''):
+    feature = gram_feat_types.get(sample)
+    if warn:
+        if sample in ambiguous_gram_feats:
+            logging.warning(f'"{sample}" appears in several grammar '
+                            f'features, returning "{feature}"')
+        elif sample == "participle":
+            logging.warning('"participle" removed from "type" feature '
+                            'for functionality')
+        elif feature is None and sample != 'form':
+            logging.warning(f'"{sample}" not a known grammar feature.')
+    return feature
+
+
+class _DeCriticTable(dict):
+    """
+    str.translate table for de_critic: code point -> unidecode of the
+    character, carons (č, ž, š) kept as they are. Filled lazily, so each
+    distinct character goes through unidecode only once per process.
+    """
+    def __missing__(self, code_point: int) -> str:
+        char = chr(code_point)
+        self[code_point] = char if char in "čžšČŽŠ" else unidecode(char)
+        return self[code_point]
+
+
+_de_critic_table = _DeCriticTable()
+
+
+@lru_cache(maxsize=65536)
+def de_critic(word: str) -> str:
     """
     Strips diacritics off of Slovenian words (leaving carons)
 
     :param word: str to be stripped
-    :param inpt: ignore
     :return: stripped str
     """
-    # if word + if word[0] not in "čžšČŽŠ"
-    if word:
-        if word[0] not in "čžšČŽŠ":
-            outpt = inpt + unidecode(word[0])
-        else:
-            outpt = inpt + word[0]
-        return de_critic(word[1:], outpt)
-    else:
-        return inpt
+    return word.translate(_de_critic_table)
 
 def has_chars(test_text: str) -> bool:
     """
@@ -541,4 +568,5 @@ def has_chars(test_text: str) -> bool:
 
 
 if __name__ == "__main__":
-    return_gram_feat_type('yes')
+    configure_logging()
+    return_gram_feat_type('yes', warn=True)
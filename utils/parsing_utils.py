@@ -304,6 +304,7 @@ def record_pos_isotopes(
 
 
 if __name__ == "__main__":
+    configure_logging()
     current_dir = os.path.dirname(os.path.abspath(__file__))
     proj_dir = os.path.abspath(os.path.join(current_dir, '..'))
     slolex_dir = os.path.abspath(os.path.join(proj_dir, 'data', 'Sloleks.3.0'))
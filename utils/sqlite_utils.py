@@ -1,50 +1,87 @@
 from common.imports import *
-from slo_dict_gen_pkg import SloleksEntry, Representation, logging, SskjEntry
-from slo_dict_gen_pkg.formatting import InflectionSection
-from utils.html_utils import extract_htmltext_except
+from slo_dict_gen_pkg import SloleksEntry, Representation, logging, \
+    SskjEntry, XMLtoSloleksEntrys
+from slo_dict_gen_pkg.formatting import InflectionSection, renderer_version
+from utils.grammar_utils import de_critic
 
-from tqdm import tqdm
-from bs4 import BeautifulSoup
+from collections import Counter, defaultdict
 
 import pickle
 import sqlite3
+import ntpath
+import json
+import re
+
+# tqdm and bs4 are imported by the builders that use them: SloleksLookup
+# workers only need sqlite3
 
 sskj_entries_db: str = os.path.abspath(os.path.join(
     proj_dir, 'data', 'db', 'sskj_entries.db'))
 sloleks_db: str = os.path.abspath(os.path.join(
     proj_dir, 'data', 'db', 'sloleks.db'))
+# {sskj_entries id: {Slovenian text: English translation}}, see
+# data/translations/merged_station/what you need to know.md
+sskj_translations_json: str = os.path.abspath(os.path.join(
+    proj_dir, 'data', 'translations', 'merged_station',
+    'id_final_trans.json'))
+# Forms whose share of their lemma's total frequency is below this are rare;
+# unattested forms always are. 0.0 flags exactly the frequency == 0 forms
+# Tables.gray_unused grayed before, so rendering only changes on request.
+RARE_SHARE: float = 0.0
 
 
 class SloleksToSQLite:
-    def __init__(self, db_name: str, working_directory: str):
+    def __init__(self, db_name: str, working_directory: str,
+                 bulk: bool = False, rare_share: float = RARE_SHARE):
         """
         Instantiation generates SQLite database from all pkl'd SloleksEntry objects at path
 
         :param db_name: name of db including .db
         :param working_directory: directory with pickles and db destination
+        :param bulk: load with bulk_insert_sloleks_entries under load-time
+            PRAGMAs instead of row-by-row inserts
+        :param rare_share: see set_rare_flags
         """
         conn = sqlite3.connect(os.path.join(working_directory, db_name))
         self.create_tables(conn)
+        if bulk:
+            self.set_bulk_load_pragmas(conn)
+        insert = (self.bulk_insert_sloleks_entries if bulk
+                  else self.insert_sloleks_entry)
 
+        from tqdm import tqdm
         for file_name in tqdm(os.listdir(working_directory)):
             if file_name.endswith('.pkl'):
                 file_path = os.path.join(working_directory, file_name)
                 with open(file_path, 'rb') as f:
                     data = pickle.load(f)
-                    self.insert_sloleks_entry(conn, data)
+                    insert(conn, data, rare_share)
 
+        self.create_indexes(conn)
+        if bulk:
+            self.finish_bulk_load(conn)
         conn.close()
 
     @staticmethod
-    def create_tables(self, conn) -> None:
+    def create_tables(conn) -> None:
         c = conn.cursor()
         c.execute('''CREATE TABLE IF NOT EXISTS SloleksEntry (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         lemma TEXT,
                         part_of_speech TEXT,
                         xml_file TEXT,
-                        inflection_section TEXT
+                        inflection_section TEXT,
+                        source_hash TEXT,
+                        renderer_version TEXT,
+                        rare_flags TEXT
                      )''')
+        # dbs built before incremental rebuilds and frequency statistics
+        # existed lack these columns
+        columns = {row[1] for row in
+                   c.execute('PRAGMA table_info(SloleksEntry)')}
+        for column in ('source_hash', 'renderer_version', 'rare_flags'):
+            if column not in columns:
+                c.execute(f'ALTER TABLE SloleksEntry ADD COLUMN {column} TEXT')
         c.execute('''CREATE TABLE IF NOT EXISTS LemmaGrammaticalFeature (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         sloleks_entry_id INTEGER,
@@ -87,12 +124,17 @@ class SloleksToSQLite:
         conn.commit()
 
     @staticmethod
-    def insert_sloleks_entry(self, conn,
-                             sloleks_entries: List[SloleksEntry]) -> None:
+    def insert_sloleks_entry(conn,
+                             sloleks_entries: List[SloleksEntry],
+                             rare_share: float = RARE_SHARE) -> None:
         c = conn.cursor()
+        version = SloleksToSQLite.rendered_version(rare_share)
 
-        sloleks_entry_stmt = '''INSERT INTO SloleksEntry (lemma, part_of_speech, xml_file, inflection_section) 
-                                VALUES (?, ?, ?, ?)'''
+        sloleks_entry_stmt = '''INSERT INTO SloleksEntry (
+                                    lemma, part_of_speech, xml_file,
+                                    inflection_section, source_hash,
+                                    renderer_version, rare_flags)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)'''
         lemma_grammatical_feature_stmt = '''INSERT INTO LemmaGrammaticalFeature (sloleks_entry_id, type, aspect, vform, number, gender, person) 
                                             VALUES (?, ?, ?, ?, ?, ?, ?)'''
         word_form_stmt = '''INSERT INTO WordForm (sloleks_entry_id, lemma, part_of_speech, msd, v_form, grammatical_case, person, number, gender, degree, clitic) 
@@ -101,10 +143,13 @@ class SloleksToSQLite:
                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
 
         for sloleks_entry in sloleks_entries:
+            rare_flags = SloleksToSQLite.set_rare_flags(sloleks_entry,
+                                                        rare_share)
             inflection_section = str(InflectionSection(sloleks_entry))
             c.execute(sloleks_entry_stmt, (
             sloleks_entry.lemma, sloleks_entry.part_of_speech,
-            sloleks_entry.xml_file, inflection_section))
+            sloleks_entry.xml_file, inflection_section,
+            sloleks_entry.content_hash(), version, rare_flags))
             sloleks_entry_id = c.lastrowid
 
             c.execute(lemma_grammatical_feature_stmt,
@@ -138,9 +183,521 @@ class SloleksToSQLite:
 
         conn.commit()
 
+    @staticmethod
+    def bulk_insert_sloleks_entries(
+            conn, sloleks_entries: List[SloleksEntry],
+            rare_share: float = RARE_SHARE) -> None:
+        """
+        Writes the same rows as insert_sloleks_entry, but assigns every id up
+        front (continuing each table's AUTOINCREMENT sequence) so that each
+        table is filled by a single executemany instead of one execute and
+        lastrowid round trip per row.
+
+        :param conn: sqlite3 connection
+        :param sloleks_entries: entries to insert, committed as one batch
+        :param rare_share: see set_rare_flags
+        """
+        c = conn.cursor()
+        version = SloleksToSQLite.rendered_version(rare_share)
+
+        def next_id(table: str) -> int:
+            c.execute('SELECT seq FROM sqlite_sequence WHERE name = ?',
+                      (table,))
+            row = c.fetchone()
+            return (row[0] if row else 0) + 1
+
+        sloleks_entry_id = next_id('SloleksEntry')
+        lemma_grammatical_feature_id = next_id('LemmaGrammaticalFeature')
+        word_form_id = next_id('WordForm')
+        representation_id = next_id('Representation')
+
+        sloleks_entry_rows = []
+        lemma_grammatical_feature_rows = []
+        word_form_rows = []
+        representation_rows = []
+
+        for sloleks_entry in sloleks_entries:
+            rare_flags = SloleksToSQLite.set_rare_flags(sloleks_entry,
+                                                        rare_share)
+            inflection_section = str(InflectionSection(sloleks_entry))
+            sloleks_entry_rows.append((
+                sloleks_entry_id, sloleks_entry.lemma,
+                sloleks_entry.part_of_speech, sloleks_entry.xml_file,
+                inflection_section, sloleks_entry.content_hash(),
+                version, rare_flags))
+
+            features = sloleks_entry.lemma_grammatical_features
+            lemma_grammatical_feature_rows.append((
+                lemma_grammatical_feature_id, sloleks_entry_id,
+                features.get('type'), features.get('aspect'),
+                features.get('vform'), features.get('number'),
+                features.get('gender'), features.get('person')))
+            lemma_grammatical_feature_id += 1
+
+            for word_form in sloleks_entry.all_forms:
+                word_form_rows.append((
+                    word_form_id, sloleks_entry_id, word_form.lemma,
+                    word_form.part_of_speech, word_form.msd,
+                    word_form.v_form, word_form.case, word_form.person,
+                    word_form.number, word_form.gender, word_form.degree,
+                    word_form.clitic))
+
+                for representation in word_form.representations:
+                    representation_rows.append((
+                        representation_id, sloleks_entry_id, word_form_id,
+                        representation.form_representation,
+                        str(representation.norms),
+                        representation.frequency,
+                        str(representation.accentuations),
+                        representation.pronunciation_dict.get('IPA'),
+                        representation.pronunciation_dict.get('SAMPA')))
+                    representation_id += 1
+                word_form_id += 1
+            sloleks_entry_id += 1
+
+        c.executemany('''INSERT INTO SloleksEntry (
+                             id, lemma, part_of_speech, xml_file,
+                             inflection_section, source_hash,
+                             renderer_version, rare_flags)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                      sloleks_entry_rows)
+        c.executemany('''INSERT INTO LemmaGrammaticalFeature (
+                             id, sloleks_entry_id, type, aspect, vform,
+                             number, gender, person)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                      lemma_grammatical_feature_rows)
+        c.executemany('''INSERT INTO WordForm (
+                             id, sloleks_entry_id, lemma, part_of_speech,
+                             msd, v_form, grammatical_case, person, number,
+                             gender, degree, clitic)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                      word_form_rows)
+        c.executemany('''INSERT INTO Representation (
+                             id, sloleks_entry_id, word_form_id,
+                             form_representation, norms, frequency,
+                             accentuations, ipa, sampa)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                      representation_rows)
+
+        conn.commit()
+
+    @staticmethod
+    def set_rare_flags(sloleks_entry: SloleksEntry,
+                       rare_share: float = RARE_SHARE) -> str:
+        """
+        Sets Representation.rare on an entry about to be rendered, with the
+        rule columnar_utils.frequency_statistics applies to the whole
+        lexicon: unattested, or below rare_share of the entry's total
+        frequency. The rule only reads the entry itself, so the stored
+        section and flags agree with the statistics computed later.
+
+        :param sloleks_entry: SloleksEntry about to be rendered
+        :param rare_share: lemma share below which an attested form is rare
+        :return: the flags as stored in SloleksEntry.rare_flags, a '0'/'1'
+            per representation in all_reps order
+        """
+        frequencies = [rep.frequency or 0 for rep in sloleks_entry.all_reps]
+        lemma_total = sum(frequencies)
+        for rep, frequency in zip(sloleks_entry.all_reps, frequencies):
+            lemma_share = frequency / lemma_total if lemma_total > 0 else 0.0
+            rep.rare = frequency == 0 or lemma_share < rare_share
+        return ''.join('1' if rep.rare else '0'
+                       for rep in sloleks_entry.all_reps)
+
+    @staticmethod
+    def rendered_version(rare_share: float = RARE_SHARE) -> str:
+        """
+        Version stored in SloleksEntry.renderer_version: renderer_version()
+        plus the rare threshold the section was grayed with, so changing
+        either marks stored sections as stale.
+        """
+        return f'{renderer_version()}:{rare_share!r}'
+
+    @staticmethod
+    def set_bulk_load_pragmas(conn) -> None:
+        """
+        Speeds up loading without giving up crash safety: in WAL mode with
+        synchronous = NORMAL a commit is an append to the write-ahead log
+        with no fsync, and a killed or crashed run leaves a consistent db
+        missing at most its last transactions, so SloleksXMLToSQLite can
+        resume it. Undo with finish_bulk_load.
+        """
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA cache_size = -262144')  # KiB, i.e. 256 MiB
+        conn.execute('PRAGMA temp_store = MEMORY')
+
+    @staticmethod
+    def finish_bulk_load(conn) -> None:
+        """
+        Checkpoints the write-ahead log into the db and returns it to the
+        default rollback journal, so read-only connections (SloleksLookup)
+        do not need write access to the -wal/-shm files.
+        """
+        conn.execute('PRAGMA journal_mode = DELETE')
+
+    @staticmethod
+    def create_indexes(conn) -> None:
+        """
+        Builds secondary indexes. Called once after loading, which is much
+        cheaper than keeping the indexes up to date row by row.
+        """
+        c = conn.cursor()
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_lgf_sloleks_entry_id
+                     ON LemmaGrammaticalFeature(sloleks_entry_id)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_wordform_sloleks_entry_id
+                     ON WordForm(sloleks_entry_id)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_rep_sloleks_entry_id
+                     ON Representation(sloleks_entry_id)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_rep_word_form_id
+                     ON Representation(word_form_id)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_entry_lemma
+                     ON SloleksEntry(lemma)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_entry_xml_file
+                     ON SloleksEntry(xml_file)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_entry_source_hash
+                     ON SloleksEntry(source_hash)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_rep_form_representation
+                     ON Representation(form_representation,
+                                       sloleks_entry_id)''')
+        conn.commit()
+
+
+class SloleksLookup:
+    """
+    Read API over a sloleks.db built by SloleksToSQLite. Holds one read-only
+    connection for its whole lifetime; the queries are fixed SQL strings, so
+    sqlite3 prepares each statement once and reuses it from its cache.
+
+    Public Methods:
+        entries(lemma): SloleksEntry rows for a lemma.
+        lemmas_for_form(form_representation): (lemma, part_of_speech) pairs
+        that have the given word form.
+        forms(sloleks_entry_id): WordForm + Representation rows of an entry.
+        apply_rare_flags(entry): Sets the precomputed Representation.rare
+        flags of a parsed SloleksEntry.
+    """
+    ENTRIES_STMT = '''SELECT id, lemma, part_of_speech, xml_file,
+                             inflection_section
+                      FROM SloleksEntry WHERE lemma = ?'''
+    LEMMAS_FOR_FORM_STMT = '''SELECT DISTINCT e.lemma, e.part_of_speech
+                              FROM Representation r
+                              JOIN SloleksEntry e ON e.id = r.sloleks_entry_id
+                              WHERE r.form_representation = ?'''
+    FORMS_STMT = '''SELECT w.msd, w.v_form, w.grammatical_case, w.person,
+                           w.number, w.gender, w.degree, w.clitic,
+                           r.form_representation, r.norms, r.frequency,
+                           r.accentuations, r.ipa, r.sampa
+                      FROM Representation r
+                      JOIN WordForm w ON w.id = r.word_form_id
+                      WHERE r.sloleks_entry_id = ?
+                      ORDER BY r.id'''
+    RARE_FLAGS_STMT = '''SELECT rare_flags FROM SloleksEntry
+                         WHERE source_hash = ? AND rare_flags IS NOT NULL
+                         LIMIT 1'''
+
+    def __init__(self, db_path: str = sloleks_db):
+        """
+        :param db_path: path to sloleks.db; run
+            SloleksToSQLite.create_indexes on dbs built before the lookup
+            indexes existed
+        """
+        self.conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def entries(self, lemma: str) -> List[sqlite3.Row]:
+        return self.conn.execute(self.ENTRIES_STMT, (lemma,)).fetchall()
+
+    def lemmas_for_form(self, form_representation: str
+                        ) -> List[Tuple[str, str]]:
+        return [tuple(row) for row in self.conn.execute(
+            self.LEMMAS_FOR_FORM_STMT, (form_representation,))]
+
+    def forms(self, sloleks_entry_id: int) -> List[sqlite3.Row]:
+        return self.conn.execute(self.FORMS_STMT,
+                                 (sloleks_entry_id,)).fetchall()
+
+    def apply_rare_flags(self, entry: SloleksEntry) -> None:
+        """
+        Copies the rare flags stored with the entry's row (see
+        SloleksToSQLite.set_rare_flags and
+        columnar_utils.store_frequency_statistics) onto the representations
+        of an entry parsed from XML, so Tables.gray_unused reads them instead
+        of deciding per form. The flags are one string per SloleksEntry row,
+        a '0'/'1' per representation in all_reps order, found through the
+        entry's content hash with a single indexed lookup. Entries without
+        stored flags keep rare = None.
+
+        :param entry: SloleksEntry about to be rendered
+        """
+        row = self.conn.execute(self.RARE_FLAGS_STMT,
+                                (entry.content_hash(),)).fetchone()
+        if row is None or len(row[0]) != len(entry.all_reps):
+            return
+        for rep, flag in zip(entry.all_reps, row[0]):
+            rep.rare = flag == '1'
+
+
+class SloleksXMLToSQLite(SloleksToSQLite):
+    def __init__(self, db_name: str, working_directory: str,
+                 xml_directory: str, batch_size: int = 1000,
+                 bulk: bool = False, rare_share: float = RARE_SHARE):
+        """
+        Instantiation streams every Sloleks XML file in xml_directory straight
+        into the SQLite database, skipping the pickle stage entirely.
+
+        Entries are written in transactions of at most batch_size entries. A
+        file is recorded in IngestedFile in the same transaction as its last
+        batch, so a killed run can simply be restarted: finished files are
+        skipped and rows of a half-written file are deleted and redone. Files
+        are recorded and matched by file name, so a restart may spell
+        xml_directory differently (relative vs absolute).
+
+        :param db_name: name of db including .db
+        :param working_directory: db destination
+        :param xml_directory: directory with Sloleks XML files
+        :param batch_size: max entries held in memory and per transaction
+        :param bulk: load with bulk_insert_sloleks_entries under load-time
+            PRAGMAs instead of row-by-row inserts
+        :param rare_share: see set_rare_flags
+        """
+        conn = sqlite3.connect(os.path.join(working_directory, db_name))
+        self.create_tables(conn)
+        self.create_ingest_log(conn)
+        if bulk:
+            self.set_bulk_load_pragmas(conn)
+        insert = (self.bulk_insert_sloleks_entries if bulk
+                  else self.insert_sloleks_entry)
+        ingested = self.ingested_files(conn)
+
+        xml_files = sorted(os.path.join(xml_directory, f)
+                           for f in os.listdir(xml_directory)
+                           if f.endswith('.xml'))
+        from tqdm import tqdm
+        try:
+            for xml_file in tqdm([f for f in xml_files
+                                  if self.xml_file_name(f) not in ingested]):
+                self.delete_xml_file_rows(conn, xml_file)
+                batch: List[SloleksEntry] = []
+                for entry in XMLtoSloleksEntrys(xml_file, stream=True):
+                    batch.append(entry)
+                    if len(batch) >= batch_size:
+                        insert(conn, batch, rare_share)
+                        batch = []
+                conn.execute('INSERT INTO IngestedFile (xml_file) VALUES (?)',
+                             (self.xml_file_name(xml_file),))
+                insert(conn, batch, rare_share)
+            self.create_indexes(conn)
+            if bulk:
+                self.finish_bulk_load(conn)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def xml_file_name(xml_file: str) -> str:
+        """
+        File name of a stored xml_file path, whichever directory and path
+        separator (/ or \\) it was written with
+        """
+        return ntpath.basename(xml_file)
+
+    @classmethod
+    def create_ingest_log(cls, conn) -> None:
+        conn.execute('''CREATE TABLE IF NOT EXISTS IngestedFile (
+                            xml_file TEXT PRIMARY KEY
+                        )''')
+        # logs written before files were keyed on file names hold full paths
+        paths = [xml_file for xml_file in cls.ingested_files(conn)
+                 if cls.xml_file_name(xml_file) != xml_file]
+        conn.executemany('INSERT OR IGNORE INTO IngestedFile VALUES (?)',
+                         [(cls.xml_file_name(path),) for path in paths])
+        conn.executemany('DELETE FROM IngestedFile WHERE xml_file = ?',
+                         [(path,) for path in paths])
+        conn.commit()
+
+    @staticmethod
+    def ingested_files(conn) -> Set[str]:
+        return {row[0] for row in
+                conn.execute('SELECT xml_file FROM IngestedFile')}
+
+    @classmethod
+    def delete_xml_file_rows(cls, conn, xml_file: str) -> None:
+        """
+        Removes every row belonging to entries of xml_file, i.e. what an
+        interrupted run left behind, matching rows by file name whatever
+        directory they were written from. Not committed on its own; it
+        becomes part of the file's first batch transaction.
+        """
+        name = cls.xml_file_name(xml_file)
+        # LIKE narrows the scan to paths ending in the name in C
+        ends_with_name = '%' + re.sub(r'([%_!])', r'!\1', name)
+        cls.delete_entries(conn, [
+            row_id for row_id, stored_file in conn.execute(
+                '''SELECT id, xml_file FROM SloleksEntry
+                   WHERE xml_file LIKE ? ESCAPE '!'
+                ''', (ends_with_name,))
+            if cls.xml_file_name(stored_file) == name])
+
+    @staticmethod
+    def delete_entries(conn, sloleks_entry_ids: List[int]) -> None:
+        """
+        Removes the given entries and their dependent rows. Not committed.
+        """
+        id_rows = [(sloleks_entry_id,) for sloleks_entry_id
+                   in sloleks_entry_ids]
+        for table in ('Representation', 'WordForm',
+                      'LemmaGrammaticalFeature'):
+            conn.executemany(
+                f'DELETE FROM {table} WHERE sloleks_entry_id = ?', id_rows)
+        conn.executemany('DELETE FROM SloleksEntry WHERE id = ?', id_rows)
+
+
+class SloleksIncrementalUpdate(SloleksXMLToSQLite):
+    def __init__(self, db_name: str, working_directory: str,
+                 xml_directory: str, batch_size: int = 1000,
+                 rare_share: float = RARE_SHARE):
+        """
+        Instantiation brings an existing database in line with the XML files
+        in xml_directory, rendering and writing only what changed. Entries
+        are matched within their XML file, by file name (so rows written by
+        SloleksToSQLite or under another spelling of xml_directory match
+        too), and by SloleksEntry.content_hash():
+            - same hash, current rendered_version(rare_share): row left
+              untouched
+            - same hash, older renderer version or another rare_share:
+              inflection_section and rare_flags re-rendered in place
+            - hash not in the db: entry inserted
+            - db hash no longer in the XML: entry deleted
+            - row of a file no longer in xml_directory: entry deleted
+        Rows written before the hash columns existed never match, so the
+        first update of such a db re-renders everything once.
+
+        If the db holds frequency statistics (RepresentationStats) and any
+        entry was inserted or deleted or got different rare flags, they are
+        recomputed with columnar_utils.refresh_frequency_statistics, as
+        percentiles depend on the whole lexicon.
+
+        :param db_name: name of db including .db
+        :param working_directory: db location
+        :param xml_directory: directory with Sloleks XML files
+        :param batch_size: max new entries held in memory and per insert
+        :param rare_share: see set_rare_flags; also passed on to
+            refresh_frequency_statistics
+        """
+        conn = sqlite3.connect(os.path.join(working_directory, db_name))
+        self.create_tables(conn)
+        self.create_ingest_log(conn)
+        self.create_indexes(conn)
+        version = self.rendered_version(rare_share)
+        self.counts: Counter = Counter()
+
+        xml_files = sorted(os.path.join(xml_directory, f)
+                           for f in os.listdir(xml_directory)
+                           if f.endswith('.xml'))
+        current_names = {self.xml_file_name(f) for f in xml_files}
+        # file name -> source_hash -> [(id, renderer_version, rare_flags)]
+        stored_by_file: Dict[str, Dict[str, List[Tuple[int, str, str]]]] = \
+            defaultdict(lambda: defaultdict(list))
+        for row_id, xml_file, source_hash, row_version, rare_flags in \
+                conn.execute('''SELECT id, xml_file, source_hash,
+                                       renderer_version, rare_flags
+                                FROM SloleksEntry ORDER BY id'''):
+            stored_by_file[self.xml_file_name(xml_file or '')][
+                source_hash].append((row_id, row_version, rare_flags))
+        from tqdm import tqdm
+        try:
+            stale = [row_id
+                     for name in set(stored_by_file) - current_names
+                     for rows in stored_by_file.pop(name).values()
+                     for row_id, *_ in rows]
+            self.delete_entries(conn, stale)
+            self.counts['deleted'] += len(stale)
+            conn.executemany(
+                'DELETE FROM IngestedFile WHERE xml_file = ?',
+                [(xml_file,) for xml_file in self.ingested_files(conn)
+                 if xml_file not in current_names])
+            conn.commit()
+
+            for xml_file in tqdm(xml_files):
+                stored = stored_by_file.get(self.xml_file_name(xml_file), {})
+
+                new_entries: List[SloleksEntry] = []
+                for entry in XMLtoSloleksEntrys(xml_file, stream=True):
+                    matches = stored.get(entry.content_hash())
+                    if not matches:
+                        new_entries.append(entry)
+                        if len(new_entries) >= batch_size:
+                            self.insert_sloleks_entry(conn, new_entries,
+                                                      rare_share)
+                            self.counts['inserted'] += len(new_entries)
+                            new_entries = []
+                        continue
+                    row_id, row_version, row_flags = matches.pop(0)
+                    if row_version == version:
+                        self.counts['unchanged'] += 1
+                    else:
+                        rare_flags = self.set_rare_flags(entry, rare_share)
+                        conn.execute(
+                            '''UPDATE SloleksEntry
+                               SET inflection_section = ?,
+                                   renderer_version = ?,
+                                   rare_flags = ?
+                               WHERE id = ?''',
+                            (str(InflectionSection(entry)), version,
+                             rare_flags, row_id))
+                        self.counts['re-rendered'] += 1
+                        if rare_flags != row_flags:
+                            self.counts['re-flagged'] += 1
+
+                removed = [row_id for rows in stored.values()
+                           for row_id, *_ in rows]
+                self.delete_entries(conn, removed)
+                self.counts['deleted'] += len(removed)
+                conn.execute('''INSERT OR IGNORE INTO IngestedFile (xml_file)
+                                VALUES (?)''', (self.xml_file_name(xml_file),))
+                self.insert_sloleks_entry(conn, new_entries, rare_share)
+                self.counts['inserted'] += len(new_entries)
+            has_stats = conn.execute(
+                'SELECT 1 FROM sqlite_master WHERE name = ?',
+                ('RepresentationStats',)).fetchone()
+        finally:
+            conn.close()
+
+        if has_stats and (self.counts['inserted'] or self.counts['deleted']
+                          or self.counts['re-flagged']):
+            from utils.columnar_utils import refresh_frequency_statistics
+            refresh_frequency_statistics(
+                os.path.join(working_directory, db_name), rare_share)
+
 
 class SskjEntrystoSQLite:
-    def __init__(self, db_name: str, data: List[SskjEntry]):
+    def __init__(self, db_name: str, data: List[SskjEntry],
+                 batch_size: int = 1000):
+        """
+        Instantiation writes data (head words and sub words, as listed by
+        HTMLParser) into sskj_entries. An entry equal to one already stored,
+        i.e. with the same content hash, is written once: repeats resolve
+        to the stored id through an in-memory hash -> id map, so no lookup
+        query runs per entry. Ids are assigned up front and rows are written
+        batch_size at a time with executemany.
+
+        The sskj_search full-text index is rebuilt afterwards; rebuild it
+        again with create_search_index once translations exist.
+
+        :param db_name: name of db including .db, created in data/db
+        :param data: SskjEntry objects to store
+        :param batch_size: rows per executemany
+        """
         db_dir = os.path.abspath(
             os.path.join(proj_dir, 'data', 'db'))
         db_path = os.path.abspath(
@@ -150,19 +707,32 @@ class SskjEntrystoSQLite:
 
         # Insert entries into the database
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        self.seen: Dict[str, int] = self.stored_hashes(conn)
+        self.next_id: int = conn.execute(
+            'SELECT COALESCE(MAX(id), 0) + 1 FROM sskj_entries').fetchone()[0]
+        self.rows: List[list] = []
+        from tqdm import tqdm
         try:
             for entry in tqdm(data):
-                self.insert_entry(entry, None, cursor)
+                self.insert_entry(entry, None)
+                if len(self.rows) >= batch_size:
+                    self.write_rows(conn)
+            self.write_rows(conn)
             conn.commit()
         except sqlite3.DatabaseError as e:
             print(f"Database error: {e}")
             conn.rollback()
         finally:
             conn.close()
+        self.create_search_index(db_path)
 
     @staticmethod
     def parse_html_for_header_qualifiers(html: str) -> List[str]:
+        """
+        Only for SskjEntry objects pickled before HTMLParser filled in
+        header_qualifiers; fresh entries carry them already.
+        """
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, 'html.parser')
         tags = soup.find_all(attrs={"data-group": "header qualifier"})
         unique_qualifiers = set()
@@ -178,55 +748,236 @@ class SskjEntrystoSQLite:
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS sskj_entries (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                content_hash TEXT,
                 html TEXT,
                 accentuation TEXT,
                 lemma TEXT,
                 definitions TEXT,
                 header_qualifiers TEXT,
                 parent INTEGER,
-                children TEXT,
-                UNIQUE(html, accentuation)
+                children TEXT
             )
         ''')
+        # dbs built before the hash existed deduplicated on
+        # UNIQUE(html, accentuation); give their rows a hash too
+        columns = {row[1] for row in
+                   cursor.execute('PRAGMA table_info(sskj_entries)')}
+        if 'content_hash' not in columns:
+            cursor.execute(
+                'ALTER TABLE sskj_entries ADD COLUMN content_hash TEXT')
+            cursor.executemany(
+                'UPDATE sskj_entries SET content_hash = ? WHERE id = ?',
+                [(SskjEntry(html, accentuation, None, [], None)
+                  .content_hash(), row_id)
+                 for row_id, html, accentuation in cursor.execute(
+                    'SELECT id, html, accentuation FROM sskj_entries'
+                 ).fetchall()])
+        cursor.execute('''CREATE UNIQUE INDEX IF NOT EXISTS
+                          idx_sskj_content_hash
+                          ON sskj_entries(content_hash)''')
         conn.commit()
         conn.close()
 
     @staticmethod
-    def find_entry_id(html: str, accentuation: str, cursor) -> Optional[int]:
-        cursor.execute('''
-            SELECT id FROM sskj_entries WHERE html = ? AND accentuation = ?
-        ''', (html, accentuation))
-        result = cursor.fetchone()
-        return result[0] if result else None
-
-    def insert_entry(self, entry: SskjEntry, parent_id: Optional[int],
-                     cursor) -> int:
-        existing_id = self.find_entry_id(entry.html, entry.accentuation,
-                                         cursor)
+    def stored_hashes(conn) -> Dict[str, int]:
+        return dict(conn.execute(
+            'SELECT content_hash, id FROM sskj_entries'))
+
+    def insert_entry(self, entry: SskjEntry,
+                     parent_id: Optional[int]) -> int:
+        """
+        Queues the row of entry, then those of its sub words, with ids in
+        that order (parent before children).
+
+        :return: id of entry, or of the stored entry equal to it
+        """
+        content_hash = entry.content_hash()
+        existing_id = self.seen.get(content_hash)
         if existing_id is not None:
             return existing_id
 
+        entry_id = self.next_id
+        self.next_id += 1
+        self.seen[content_hash] = entry_id
+
         definitions = '; '.join(entry.definitions)
-        header_qualifiers = ';'.join(
-            self.parse_html_for_header_qualifiers(entry.html))
-        cursor.execute('''
-            INSERT INTO sskj_entries (html, accentuation, lemma, definitions, header_qualifiers, parent, children)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (entry.html, entry.accentuation, entry.lemma, definitions,
-              header_qualifiers, parent_id, ''))
-        entry_id = cursor.lastrowid
+        qualifiers = entry.header_qualifiers
+        if qualifiers is None:
+            qualifiers = self.parse_html_for_header_qualifiers(entry.html)
+        header_qualifiers = ';'.join(qualifiers)
+        row = [entry_id, content_hash, entry.html, entry.accentuation,
+               entry.lemma, definitions, header_qualifiers, parent_id, '']
+        self.rows.append(row)
         children_ids = []
         if entry.sub_words:
             for sub_entry in entry.sub_words:
-                sub_entry_id = self.insert_entry(sub_entry, entry_id, cursor)
+                sub_entry_id = self.insert_entry(sub_entry, entry_id)
                 children_ids.append(sub_entry_id)
-        cursor.execute('''
-            UPDATE sskj_entries
-            SET children = ?
-            WHERE id = ?
-        ''', (';'.join(map(str, children_ids)), entry_id))
+        row[-1] = ';'.join(map(str, children_ids))
         return entry_id
 
+    def write_rows(self, conn) -> None:
+        conn.executemany('''
+            INSERT INTO sskj_entries (id, content_hash, html, accentuation,
+                                      lemma, definitions, header_qualifiers,
+                                      parent, children)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', self.rows)
+        self.rows = []
+
+    @staticmethod
+    def load_translations(translations_path: str = sskj_translations_json
+                          ) -> Dict[int, str]:
+        """
+        :param translations_path: id_final_trans.json written by
+            temp_tools/translation_cleaner.py
+        :return: sskj_entries id -> English translations of the entry's
+            text, space-joined; empty if the file does not exist yet
+        """
+        if not os.path.exists(translations_path):
+            return {}
+        with open(translations_path, 'r', encoding='utf-8') as f:
+            translations: Dict[str, Dict[str, str]] = json.load(f)
+        return {int(row_id): ' '.join(text for text in pairs.values() if text)
+                for row_id, pairs in translations.items()}
+
+    @staticmethod
+    def create_search_index(
+            db_path: str = sskj_entries_db,
+            translations_path: str = sskj_translations_json
+    ) -> None:
+        """
+        (Re)builds sskj_search, the FTS5 index SskjSearch queries: lemma,
+        definitions and English translation of every sskj_entries row, keyed
+        by its id. The text is folded with de_critic before it is indexed
+        (and so are queries), so accents are ignored the way lemmas already
+        ignore them while č, ž, š stay distinct letters; unicode61's own
+        remove_diacritics would fold those too.
+
+        :param db_path: sskj_entries.db built by SskjEntrystoSQLite
+        :param translations_path: see load_translations
+        """
+        translations = SskjEntrystoSQLite.load_translations(translations_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute('DROP TABLE IF EXISTS sskj_search')
+            conn.execute('''CREATE VIRTUAL TABLE sskj_search USING fts5(
+                                lemma, definitions, english,
+                                tokenize = 'unicode61 remove_diacritics 0',
+                                prefix = '2 3'
+                            )''')
+            conn.executemany(
+                '''INSERT INTO sskj_search (rowid, lemma, definitions, english)
+                   VALUES (?, ?, ?, ?)''',
+                ((row_id, de_critic(lemma or ''), de_critic(definitions or ''),
+                  de_critic(translations.get(row_id, '')))
+                 for row_id, lemma, definitions in conn.execute(
+                    'SELECT id, lemma, definitions FROM sskj_entries')))
+            # Persistent bm25 column weights, so ORDER BY rank uses them
+            conn.execute('''INSERT INTO sskj_search (sskj_search, rank)
+                            VALUES ('rank', 'bm25(%s)')''' % ', '.join(
+                map(str, SskjSearch.COLUMN_WEIGHTS.values())))
+            conn.execute(
+                "INSERT INTO sskj_search (sskj_search) VALUES ('optimize')")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class SskjSearch:
+    """
+    Ranked full-text search over the sskj_search index of sskj_entries.db
+    (see SskjEntrystoSQLite.create_search_index), for the reverse
+    dictionary: find entries by words of their definitions or English
+    translations.
+
+    Public Methods:
+        search(query, limit, columns, prefix): Best matching sskj_entries
+        rows, best first.
+        match_expression(query, columns, prefix): FTS5 MATCH expression for
+        free text.
+    """
+    # bm25 weight per indexed column; a hit in the lemma outranks one in a
+    # long definition
+    COLUMN_WEIGHTS: Dict[str, float] = {
+        'lemma': 5.0,
+        'definitions': 1.0,
+        'english': 1.0,
+    }
+    SEARCH_STMT = '''SELECT e.id, e.lemma, e.accentuation, e.definitions,
+                            e.parent, s.rank
+                     FROM sskj_search s
+                     JOIN sskj_entries e ON e.id = s.rowid
+                     WHERE sskj_search MATCH ?
+                     ORDER BY s.rank
+                     LIMIT ?'''
+
+    def __init__(self, db_path: str = sskj_entries_db):
+        self.conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    @classmethod
+    def match_expression(
+            cls,
+            query: str,
+            columns: Optional[List[str]] = None,
+            prefix: bool = False
+    ) -> Optional[str]:
+        """
+        Turns free text into an FTS5 expression matching entries that
+        contain every word of it. Words are de_critic-folded and quoted, so
+        user input never reaches FTS5 as query syntax.
+
+        :param query: free text, e.g. "large cat" or "velika mačka"
+        :param columns: names of COLUMN_WEIGHTS to search, None for all
+        :param prefix: let the last word match as a prefix (search as you
+            type)
+        :return: MATCH expression, None if query has no words
+        """
+        words = re.findall(r'[^\W_]+', de_critic(query))
+        if not words:
+            return None
+        expression = ' '.join(f'"{word}"' for word in words)
+        if prefix:
+            expression += '*'
+        if columns:
+            unknown = set(columns) - set(cls.COLUMN_WEIGHTS)
+            if unknown:
+                raise ValueError(f"not a sskj_search column: {unknown}")
+            expression = f"{{{' '.join(columns)}}} : ({expression})"
+        return expression
+
+    def search(
+            self,
+            query: str,
+            limit: int = 20,
+            columns: Optional[List[str]] = None,
+            prefix: bool = False
+    ) -> List[sqlite3.Row]:
+        """
+        :param query: free text, see match_expression
+        :param limit: maximum number of hits
+        :param columns: names of COLUMN_WEIGHTS to search, None for all
+        :param prefix: let the last word match as a prefix
+        :return: (id, lemma, accentuation, definitions, parent, rank) rows,
+            best first; rank is bm25, lower is better
+        """
+        expression = self.match_expression(query, columns, prefix)
+        if expression is None:
+            return []
+        return self.conn.execute(self.SEARCH_STMT,
+                                 (expression, limit)).fetchall()
+
 
 class Merger:
     def __init__(self):
@@ -253,6 +1004,7 @@ def fetch_by_id(cursor: sqlite3.Cursor, col: str, table: str, row_id: int) -> st
 
 
 if __name__ == "__main__":
+    configure_logging()
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     pickles_dir = os.path.join(base_dir, 'data', 'pickles',
                                'sloleksentry_objects')